@@ -0,0 +1,172 @@
+"""
+ISAS Challenge 2025 - Dataset Manifest
+Tự động tìm subjects trong Train_Data và lưu index (số frame, cột, checksum)
+
+Tính năng:
+- Glob các file keypoint / keypointlabel / timetable theo pattern chuẩn
+- Index JSON cache cạnh dữ liệu, chỉ cập nhật file có mtime/size thay đổi
+- Số frame, cột và checksum của file keypoint lấy từ meta cache của KeypointStore nếu có,
+  nếu chưa có thì đọc header + đếm dòng (không build cache: việc đó để cho worker)
+- Subject = id có file keypoint hoặc keypointlabel; timetable chỉ gắn vào subject đã có
+- Có thể giới hạn tập subject được phân tích (selected_subjects)
+"""
+
+import glob
+import json
+import os
+import re
+
+import pandas as pd
+
+from keypoint_store import KeypointStore, csv_summary, file_checksum
+
+MANIFEST_FILE_NAME = '.dataset_manifest.json'
+MANIFEST_VERSION = 1
+
+# Loại file -> pattern đường dẫn (tương đối so với data_root)
+FILE_PATTERNS = {
+    'keypoint': 'keypoint/video_{subject}.csv',
+    'label': 'keypointlabel/keypoints_with_labels_{subject}.csv',
+    'timetable': 'timetable/csv/{subject}.csv',
+}
+
+# Loại file xác định một subject (timetable riêng lẻ không tạo subject mới)
+SUBJECT_KINDS = ('keypoint', 'label')
+
+
+def subject_sort_key(subject_id):
+    """Sắp xếp subject: số theo giá trị, còn lại theo chữ"""
+    return (0, int(subject_id), '') if subject_id.isdigit() else (1, 0, subject_id)
+
+
+class DatasetManifest:
+    """Index các file dữ liệu theo subject"""
+
+    def __init__(self, data_root='Train_Data', keypoint_store=None, index_path=None, verbose=True, subjects=None):
+        self.data_root = data_root
+        self.keypoint_store = keypoint_store or KeypointStore(verbose=verbose)
+        self.index_path = index_path or os.path.join(data_root, MANIFEST_FILE_NAME)
+        self.verbose = verbose
+        # None = tất cả subject tìm thấy
+        self.selected_subjects = subjects
+        self._entries = None
+
+    @property
+    def entries(self):
+        """Index {đường dẫn tương đối so với data_root: entry}, tự refresh ở lần truy cập đầu"""
+        if self._entries is None:
+            self.refresh()
+        return self._entries
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if index.get('version') != MANIFEST_VERSION:
+            return {}
+        return index.get('files', {})
+
+    def _save_index(self, entries):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': MANIFEST_VERSION, 'files': entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            if self.verbose:
+                print(f"⚠️ Không ghi được manifest {self.index_path}: {e}")
+
+    def discover(self):
+        """Glob data_root, trả về list (kind, subject_id, đường dẫn tương đối)"""
+
+        found = []
+        for kind, pattern in FILE_PATTERNS.items():
+            prefix, suffix = pattern.split('{subject}')
+            regex = re.compile(re.escape(prefix) + r'(.+)' + re.escape(suffix) + '$')
+            for path in glob.glob(os.path.join(self.data_root, pattern.format(subject='*'))):
+                relative = os.path.relpath(path, self.data_root).replace(os.sep, '/')
+                match = regex.match(relative)
+                if match:
+                    found.append((kind, match.group(1), relative))
+        return found
+
+    def _describe_file(self, kind, path):
+        """Đọc số frame, cột và checksum của một file"""
+
+        if kind == 'timetable':
+            df = pd.read_csv(path)
+            return {'n_frames': len(df), 'columns': list(df.columns), 'checksum': file_checksum(path)}
+
+        # File keypoint: dùng meta nếu cache .npy đã có, không thì quét nhanh CSV
+        # (build cache tốn thời gian nên để cho các worker làm song song)
+        meta = self.keypoint_store.cached_meta(path)
+        if meta is not None:
+            return {'n_frames': meta['n_frames'], 'columns': list(meta['columns']), 'checksum': meta['checksum']}
+        return csv_summary(path)
+
+    def refresh(self):
+        """Glob lại dữ liệu, cập nhật index cho file mới hoặc đã thay đổi"""
+
+        cached = self._load_index()
+        entries = {}
+        changed = False
+
+        for kind, subject_id, relative in self.discover():
+            path = os.path.join(self.data_root, relative)
+            stat = os.stat(path)
+            entry = cached.get(relative)
+            if entry is None or entry['mtime'] != stat.st_mtime or entry['size'] != stat.st_size:
+                entry = {
+                    'kind': kind,
+                    'subject': subject_id,
+                    'mtime': stat.st_mtime,
+                    'size': stat.st_size,
+                }
+                entry.update(self._describe_file(kind, path))
+                changed = True
+            entries[relative] = entry
+
+        if changed or set(entries) != set(cached):
+            self._save_index(entries)
+
+        self._entries = entries
+        return self
+
+    @property
+    def available_subjects(self):
+        """Các subject id có file keypoint hoặc keypointlabel trong data_root (đã sắp xếp)"""
+        return sorted({entry['subject'] for entry in self.entries.values() if entry['kind'] in SUBJECT_KINDS},
+                      key=subject_sort_key)
+
+    @property
+    def subjects(self):
+        """Danh sách subject id được phân tích (lọc theo selected_subjects nếu có)"""
+        subjects = self.available_subjects
+        if self.selected_subjects is not None:
+            selected = {str(subject_id) for subject_id in self.selected_subjects}
+            subjects = [subject_id for subject_id in subjects if subject_id in selected]
+        return subjects
+
+    def file_path(self, subject_id, kind):
+        """Đường dẫn file của subject (theo pattern, kể cả khi file không tồn tại)"""
+        return os.path.join(self.data_root, FILE_PATTERNS[kind].format(subject=subject_id))
+
+    def get_entry(self, subject_id, kind):
+        """Entry trong index (None nếu file không tồn tại)"""
+        return self.entries.get(FILE_PATTERNS[kind].format(subject=subject_id))
+
+    @staticmethod
+    def user_name(subject_id):
+        """Tên hiển thị của subject ("User 1", ...)"""
+        return f"User {subject_id}"
+
+    def data_info(self):
+        """Danh sách (tên user, đường dẫn) theo loại file, giống cấu trúc data_info cũ"""
+        return {
+            f"{kind}_files": [(self.user_name(subject_id), self.file_path(subject_id, kind)) for subject_id in self.subjects]
+            for kind in FILE_PATTERNS
+        }
@@ -0,0 +1,163 @@
+"""
+ISAS Challenge 2025 - Feature Cache
+Cache ma trận đặc trưng theo window (X, y, subjects, metadata) trên đĩa dạng npz nén
+
+Tính năng:
+- Key = checksum các file input + fingerprint nội dung DataFrame + window_size + overlap_ratio
+  + version mã nguồn extractor (các module data_analysis + source hàm/class trong notebook)
+- Đổi bất kỳ thành phần nào -> key mới, cache cũ tự động không còn được dùng
+- Giữ nguyên thứ tự cột và dtype của X, kiểu của labels/subjects/metadata
+- Ghi file tạm rồi rename (an toàn khi nhiều process cùng ghi)
+"""
+
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from keypoint_store import file_checksum
+
+FEATURE_CACHE_VERSION = 1
+# Mặc định tương đối theo cwd; notebook (Colab) truyền thư mục trên Drive để cache tồn tại qua các session
+FEATURE_CACHE_DIR = os.path.join('output', '.feature_cache')
+
+# Module mà kết quả trích xuất đặc trưng phụ thuộc vào
+EXTRACTOR_MODULES = ('keypoint_store', 'rolling_stats', 'window_features', 'window_builder',
+                     'motion_states', 'frame_primitives', 'parallel_features')
+
+
+def _code_fingerprint(code):
+    """Bytecode + hằng số (đệ quy vào hàm lồng nhau), không phụ thuộc địa chỉ bộ nhớ"""
+
+    consts = [_code_fingerprint(const) if inspect.iscode(const) else repr(const) for const in code.co_consts]
+    return code.co_code.hex() + repr(code.co_names) + repr(consts)
+
+
+def _object_source(obj):
+    """Source của hàm/class; class lấy source từng method (getsource class lỗi trong notebook)"""
+
+    if inspect.isclass(obj):
+        members = sorted(vars(obj).items())
+        return obj.__qualname__ + ''.join(_object_source(member) for _, member in members
+                                          if inspect.isfunction(member))
+    try:
+        return inspect.getsource(obj)
+    except (OSError, TypeError):
+        # Không có file nguồn (exec, một số kernel): dùng bytecode
+        code = getattr(obj, '__code__', None)
+        return obj.__qualname__ + _code_fingerprint(code) if code is not None else repr(obj)
+
+
+def source_fingerprint(*objects, modules=EXTRACTOR_MODULES):
+    """SHA-1 của mã nguồn extractor: file các module + source các hàm/class truyền vào"""
+
+    sha1 = hashlib.sha1()
+    for name in modules:
+        module = importlib.import_module(name)
+        with open(module.__file__, 'rb') as f:
+            sha1.update(f.read())
+    for obj in objects:
+        sha1.update(_object_source(obj).encode('utf-8'))
+    return sha1.hexdigest()
+
+
+def dataframe_fingerprint(df):
+    """SHA-1 nội dung DataFrame (tên cột + hash từng dòng, không tính index)"""
+
+    sha1 = hashlib.sha1()
+    sha1.update(json.dumps([str(col) for col in df.columns]).encode('utf-8'))
+    sha1.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return sha1.hexdigest()
+
+
+class FeatureMatrixCache:
+    """Cache (X, y, subjects, metadata) của một lần trích xuất đặc trưng, key = cấu hình + dữ liệu"""
+
+    def __init__(self, cache_dir=FEATURE_CACHE_DIR, verbose=True):
+        self.cache_dir = cache_dir
+        self.verbose = verbose
+
+    def key(self, window_size, overlap_ratio, extractor_version, input_files=(), data=None):
+        """Key cache: đổi file input, dữ liệu, cấu hình window hoặc mã extractor -> key khác"""
+
+        parts = {
+            'version': FEATURE_CACHE_VERSION,
+            'window_size': int(window_size),
+            'overlap_ratio': float(overlap_ratio),
+            'extractor': extractor_version,
+            'inputs': {os.path.basename(path): file_checksum(path) for path in sorted(input_files)},
+            'data': dataframe_fingerprint(data) if data is not None else None,
+        }
+        return hashlib.sha1(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"features_{key}.npz")
+
+    def load(self, key):
+        """(X DataFrame, labels, subjects, metadata) đã lưu, None nếu chưa có hoặc file hỏng"""
+
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with np.load(path, allow_pickle=False) as payload:
+                if int(payload['version']) != FEATURE_CACHE_VERSION:
+                    return None
+                columns = payload['columns'].tolist()
+                X = pd.DataFrame(payload['X'], columns=columns)
+                X = X.astype(dict(zip(columns, payload['dtypes'].tolist())))
+                labels = payload['labels'].tolist()
+                subjects = payload['subjects'].tolist()
+
+                meta_fields = payload['meta_fields'].tolist()
+                meta_columns = [payload[f'meta_{field}'].tolist() for field in meta_fields]
+                metadata = [dict(zip(meta_fields, row)) for row in zip(*meta_columns)]
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            return None
+
+        if self.verbose:
+            print(f"📦 Dùng cache đặc trưng: {path} ({X.shape[0]} windows × {X.shape[1]} features)")
+        return X, labels, subjects, metadata
+
+    def save(self, key, X, labels, subjects, metadata):
+        """Lưu kết quả trích xuất (X phải toàn cột số); trả về đường dẫn, None nếu không lưu được"""
+
+        non_numeric = [col for col in X.columns if not pd.api.types.is_numeric_dtype(X[col])]
+        if non_numeric:
+            if self.verbose:
+                print(f"⚠️ Không cache đặc trưng: có cột không phải số {non_numeric[:5]}")
+            return None
+
+        meta_fields = list(metadata[0]) if metadata else []
+        arrays = {
+            'version': np.array(FEATURE_CACHE_VERSION),
+            'X': X.to_numpy(dtype=np.float64),
+            'columns': np.array([str(col) for col in X.columns]),
+            'dtypes': np.array([str(dtype) for dtype in X.dtypes]),
+            'labels': np.asarray(labels),
+            'subjects': np.asarray(subjects),
+            'meta_fields': np.array(meta_fields, dtype=str),
+        }
+        for field in meta_fields:
+            arrays[f'meta_{field}'] = np.asarray([row[field] for row in metadata])
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        try:
+            np.savez_compressed(tmp_path, **arrays)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            if self.verbose:
+                print(f"⚠️ Không ghi được cache đặc trưng {path}: {e}")
+            return None
+
+        if self.verbose:
+            print(f"💾 Đã lưu cache đặc trưng: {path}")
+        return path
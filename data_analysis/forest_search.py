@@ -0,0 +1,173 @@
+"""
+ISAS Challenge 2025 - Forest Search
+Tìm tham số cho forest (Extra Trees / Random Forest) bằng successive halving
+
+Tính năng:
+- Tài nguyên = n_estimators: mọi cấu hình bắt đầu ở budget nhỏ nhất, chỉ 1/eta cấu hình tốt nhất
+  được đi tiếp lên budget kế tiếp
+- warm_start: lên budget lớn hơn chỉ trồng thêm cây, không fit lại cây đã có
+  (sklearn giữ nguyên chuỗi random_state nên forest giống hệt fit mới với n_estimators đó)
+- Model tốt nhất lấy ra bằng forest_prefix (n cây đầu) nên không cần fit lại
+- Thứ tự đánh giá (budget nhỏ trước, cấu hình theo thứ tự grid) giống vòng lặp grid đầy đủ,
+  hòa điểm thì giữ kết quả đánh giá trước
+- class_weight='balanced' được đổi sẵn thành trọng số từng lớp (cùng giá trị) để dùng với warm_start
+- NestedLOSOSearch: chọn tham số bằng LOSO vòng trong trên các subject train của fold ngoài,
+  fit vòng trong cache theo tập subject bị loại và dùng chung giữa các fold ngoài
+"""
+
+import copy
+import itertools
+import math
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.utils.class_weight import compute_class_weight
+
+
+def parameter_grid(params_to_tune, exclude=('n_estimators',)):
+    """Các tổ hợp tham số (list dict), khóa đầu tiên thay đổi chậm nhất như vòng for lồng nhau"""
+
+    names = [name for name in params_to_tune if name not in exclude]
+    return [dict(zip(names, values)) for values in itertools.product(*(params_to_tune[name] for name in names))]
+
+
+def forest_prefix(forest, n_estimators):
+    """Bản sao nông của forest đã fit, chỉ gồm n_estimators cây đầu tiên"""
+
+    model = copy.copy(forest)
+    model.estimators_ = forest.estimators_[:n_estimators]
+    model.n_estimators = n_estimators
+    return model
+
+
+def successive_halving(base_model, configs, budgets, X, y, score_fn, eta=3, verbose=True):
+    """Successive halving trên configs với budget n_estimators tăng dần
+
+    score_fn(model) -> điểm (càng lớn càng tốt). Trả về dict: best_model, best_params, best_score,
+    history (mọi lần đánh giá theo thứ tự), n_fits, n_trees (số cây thực sự được trồng).
+    """
+
+    budgets = sorted(set(int(budget) for budget in budgets))
+    base_model = clone(base_model)
+    if base_model.get_params().get('class_weight') == 'balanced':
+        # sklearn không khuyến nghị preset 'balanced' với warm_start; trọng số tường minh cho kết quả như nhau
+        classes = np.unique(y)
+        weights = compute_class_weight('balanced', classes=classes, y=y)
+        base_model.set_params(class_weight=dict(zip(classes.tolist(), weights)))
+    models = [clone(base_model).set_params(warm_start=True, **config) for config in configs]
+    alive = list(range(len(configs)))
+
+    result = {'best_model': None, 'best_params': None, 'best_score': -math.inf,
+              'history': [], 'n_fits': 0, 'n_trees': 0}
+
+    for rung, n_estimators in enumerate(budgets):
+        scores = {}
+        for idx in alive:
+            model = models[idx]
+            grown = len(getattr(model, 'estimators_', []))
+            model.set_params(n_estimators=n_estimators)
+            model.fit(X, y)
+            result['n_fits'] += 1
+            result['n_trees'] += n_estimators - grown
+
+            scores[idx] = score_fn(model)
+            params = {**configs[idx], 'n_estimators': n_estimators}
+            result['history'].append({'params': params, 'score': scores[idx], 'rung': rung})
+            if scores[idx] > result['best_score']:
+                result['best_score'] = scores[idx]
+                result['best_params'] = params
+                result['best_model'] = forest_prefix(model, n_estimators)
+
+        if rung < len(budgets) - 1:
+            # Giữ ceil(n / eta) cấu hình điểm cao nhất (hòa điểm: cấu hình đứng trước trong grid)
+            keep = max(1, math.ceil(len(alive) / eta))
+            survivors = sorted(alive, key=lambda idx: -scores[idx])[:keep]
+            for idx in set(alive) - set(survivors):
+                models[idx] = None
+            alive = sorted(survivors)
+            if verbose:
+                print(f"  Budget {n_estimators} trees: {len(scores)} configs -> giữ {len(alive)}")
+
+    return result
+
+
+class NestedLOSOSearch:
+    """Chọn tham số forest cho từng fold LOSO ngoài bằng LOSO vòng trong trên các subject train
+
+    Fit vòng trong chỉ phụ thuộc tập subject bị loại {subject test ngoài, subject validation}, nên
+    fold ngoài a / validation b và fold ngoài b / validation a dùng chung một fit (cache theo tập đó).
+    Mỗi cấu hình chỉ fit một lần với n_estimators lớn nhất; budget nhỏ hơn đánh giá trên forest_prefix.
+    """
+
+    def __init__(self, base_model, configs, budgets, X, y, subjects, verbose=True):
+        self.base_model = base_model
+        self.configs = configs
+        self.budgets = sorted(set(int(budget) for budget in budgets))
+        self.X = X
+        self.y = np.asarray(y)
+        self.subjects = np.asarray(subjects)
+        self.verbose = verbose
+
+        self._cache = {}
+        self.n_fits = 0
+        self.n_cache_hits = 0
+
+    def candidates(self):
+        """(index cấu hình, n_estimators) theo thứ tự của vòng lặp grid (n_estimators ngoài cùng)"""
+        return [(idx, n_estimators) for n_estimators in self.budgets for idx in range(len(self.configs))]
+
+    def inner_predictions(self, excluded):
+        """(index các dòng bị loại, {candidate: dự đoán trên các dòng đó}) của fit trên phần còn lại"""
+
+        key = frozenset(excluded)
+        if key in self._cache:
+            self.n_cache_hits += 1
+            return self._cache[key]
+
+        if self.verbose:
+            excluded_names = ', '.join(str(subject) for subject in sorted(key))
+            print(f"  Fit vòng trong (loại subject {excluded_names}): {len(self.configs)} cấu hình x {self.budgets[-1]} cây")
+        held_out = np.isin(self.subjects, list(key))
+        X_train, y_train = self.X[~held_out], self.y[~held_out]
+        X_held_out = self.X[held_out]
+
+        predictions = {}
+        for idx, config in enumerate(self.configs):
+            model = clone(self.base_model).set_params(n_estimators=self.budgets[-1], **config)
+            model.fit(X_train, y_train)
+            self.n_fits += 1
+            for n_estimators in self.budgets:
+                predictions[(idx, n_estimators)] = forest_prefix(model, n_estimators).predict(X_held_out)
+
+        self._cache[key] = (np.flatnonzero(held_out), predictions)
+        return self._cache[key]
+
+    def select(self, outer_subject):
+        """Tham số tốt nhất cho fold ngoài theo accuracy gộp của LOSO vòng trong (không dùng subject test)
+
+        Trả về dict: params, inner_accuracy, scores ({candidate: accuracy vòng trong}).
+        """
+
+        inner_subjects = [subject for subject in np.unique(self.subjects) if subject != outer_subject]
+        if len(inner_subjects) < 2:
+            raise ValueError("LOSO lồng nhau cần ít nhất 3 subject")
+
+        candidates = self.candidates()
+        correct = dict.fromkeys(candidates, 0)
+        total = 0
+        for validation_subject in inner_subjects:
+            rows, predictions = self.inner_predictions((outer_subject, validation_subject))
+            is_validation = self.subjects[rows] == validation_subject
+            y_validation = self.y[rows][is_validation]
+            total += len(y_validation)
+            for candidate in candidates:
+                correct[candidate] += int((predictions[candidate][is_validation] == y_validation).sum())
+
+        # max giữ candidate đầu tiên khi hòa điểm (giống so sánh > trong vòng lặp grid)
+        best = max(candidates, key=lambda candidate: correct[candidate])
+        idx, n_estimators = best
+        return {
+            'params': {**self.configs[idx], 'n_estimators': n_estimators},
+            'inner_accuracy': correct[best] / max(total, 1),
+            'scores': {candidate: correct[candidate] / max(total, 1) for candidate in candidates},
+        }
@@ -0,0 +1,262 @@
+"""
+ISAS Challenge 2025 - Frame Primitives
+Cache các đại lượng per-frame của một subject, dùng chung cho mọi extractor và mọi window
+
+Tính năng:
+- Tính một lần cho cả subject (lazy): bbox, vận tốc / gia tốc từng keypoint,
+  khoảng cách giữa các cặp khớp, góc khớp, tâm hông, motion từng frame
+- Window overlap chỉ cắt (slice) các chuỗi đã tính, không tính lại
+- Vận tốc tính giữa hai frame hợp lệ liên tiếp của keypoint (giống dropna + diff
+  trong notebook), window chỉ lấy các vận tốc có frame trước nằm trong window
+- as_primitive_window: extractor nhận cả DataFrame một window lẫn PrimitiveWindow
+"""
+
+import numpy as np
+import pandas as pd
+
+from keypoint_store import KEYPOINT_NAMES
+from motion_states import frame_motion
+from rolling_stats import previous_valid_index
+from window_features import keypoints_from_dataframe, rolling_bbox_features
+
+KEYPOINT_INDEX = {name: idx for idx, name in enumerate(KEYPOINT_NAMES)}
+
+EPSILON = 1e-8
+BBOX_SERIES = ('width', 'height', 'area', 'aspect_ratio', 'center_x', 'center_y', 'perimeter', 'compactness')
+
+
+def coordinate_columns(columns):
+    """Các cột tọa độ keypoint theo thứ tự DataFrame: list (tên cột, keypoint index, trục)"""
+
+    result = []
+    for col in columns:
+        for suffix, axis in (('_x', 0), ('_y', 1)):
+            kp_name = col[:-len(suffix)] if col.endswith(suffix) else None
+            if kp_name in KEYPOINT_INDEX:
+                result.append((col, KEYPOINT_INDEX[kp_name], axis))
+    return result
+
+
+def default_coordinate_columns():
+    """Thứ tự mặc định: nose_x, nose_y, left_eye_x, ..."""
+    return coordinate_columns([f"{name}{suffix}" for name in KEYPOINT_NAMES for suffix in ('_x', '_y')])
+
+
+class FramePrimitives:
+    """Các chuỗi per-frame của một subject (keypoints (N, 17, 2), NaN = không hợp lệ)"""
+
+    def __init__(self, keypoints, coordinate_order=None):
+        self.keypoints = np.asarray(keypoints, dtype=np.float64)
+        self.coordinate_order = coordinate_order or default_coordinate_columns()
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.keypoints)
+
+    def _cached(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    @property
+    def keypoint_valid(self):
+        """(N, 17): cả x và y đều hợp lệ"""
+        return self._cached('keypoint_valid', lambda: ~np.isnan(self.keypoints).any(axis=2))
+
+    @property
+    def previous_valid(self):
+        """(N, 17): frame hợp lệ trước đó của từng keypoint"""
+        return self._cached('previous_valid', lambda: previous_valid_index(self.keypoint_valid))
+
+    def _compute_velocity(self):
+        valid = self.keypoint_valid
+        previous = self.previous_valid
+        previous_coords = np.take_along_axis(self.keypoints, np.maximum(previous, 0)[:, :, np.newaxis], axis=0)
+        delta = self.keypoints - previous_coords
+        velocity = np.sqrt(delta[..., 0] ** 2 + delta[..., 1] ** 2)
+        return np.where(valid & (previous >= 0), velocity, np.nan)
+
+    @property
+    def velocity(self):
+        """(N, 17): độ lớn vận tốc so với frame hợp lệ trước đó (NaN nếu không có)"""
+        return self._cached('velocity', self._compute_velocity)
+
+    def _compute_acceleration(self):
+        previous = np.maximum(self.previous_valid, 0)
+        previous_velocity = np.take_along_axis(self.velocity, previous, axis=0)
+        return self.velocity - previous_velocity
+
+    @property
+    def acceleration(self):
+        """(N, 17): hiệu hai vận tốc liên tiếp (NaN nếu thiếu một trong hai)"""
+        return self._cached('acceleration', self._compute_acceleration)
+
+    def _compute_bbox(self, min_points):
+        x = self.keypoints[..., 0]
+        y = self.keypoints[..., 1]
+        valid = ((~np.isnan(x)).sum(axis=1) >= min_points) & ((~np.isnan(y)).sum(axis=1) >= min_points)
+
+        min_x, max_x = np.fmin.reduce(x, axis=1), np.fmax.reduce(x, axis=1)
+        min_y, max_y = np.fmin.reduce(y, axis=1), np.fmax.reduce(y, axis=1)
+        width = max_x - min_x
+        height = max_y - min_y
+        area = width * height
+        perimeter = 2 * (width + height)
+
+        series = {
+            'width': width,
+            'height': height,
+            'area': area,
+            'aspect_ratio': height / (width + EPSILON),
+            'center_x': (min_x + max_x) / 2,
+            'center_y': (min_y + max_y) / 2,
+            'perimeter': perimeter,
+            'compactness': (perimeter ** 2) / (4 * np.pi * area + EPSILON),
+        }
+        return series, valid
+
+    def bbox(self, min_points=1):
+        """(dict metric -> (N,), mask frame hợp lệ): frame cần >= min_points x và y hợp lệ"""
+        return self._cached(('bbox', min_points), lambda: self._compute_bbox(min_points))
+
+    def _compute_hip_center(self):
+        hips = self.keypoints[:, [KEYPOINT_INDEX['left_hip'], KEYPOINT_INDEX['right_hip']]]
+        valid_counts = (~np.isnan(hips)).sum(axis=1)
+        center = np.nansum(hips, axis=1) / np.maximum(valid_counts, 1)
+        return center, (valid_counts > 0).all(axis=1)
+
+    @property
+    def hip_center(self):
+        """((N, 2) trung bình các hông hợp lệ theo từng trục, mask frame có tâm)"""
+        return self._cached('hip_center', self._compute_hip_center)
+
+    def distance(self, kp1, kp2):
+        """(N,): khoảng cách giữa hai keypoint (NaN nếu một trong hai không hợp lệ)"""
+
+        def compute():
+            delta = self.keypoints[:, KEYPOINT_INDEX[kp1]] - self.keypoints[:, KEYPOINT_INDEX[kp2]]
+            return np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)
+
+        return self._cached(('distance', kp1, kp2), compute)
+
+    def angle(self, kp1, kp2, kp3):
+        """(N,): góc (độ) tại kp2 giữa kp2->kp1 và kp2->kp3 (NaN nếu thiếu điểm)"""
+
+        def compute():
+            p1, p2, p3 = (self.keypoints[:, KEYPOINT_INDEX[kp]] for kp in (kp1, kp2, kp3))
+            v1 = p1 - p2
+            v2 = p3 - p2
+            cos_angle = (v1 * v2).sum(axis=1) / (np.linalg.norm(v1, axis=1) * np.linalg.norm(v2, axis=1) + EPSILON)
+            return np.degrees(np.arccos(np.clip(cos_angle, -1.0, 1.0)))
+
+        return self._cached(('angle', kp1, kp2, kp3), compute)
+
+    @property
+    def frame_motion(self):
+        """(N-1,): motion từng frame (motion_states.frame_motion)"""
+        return self._cached('frame_motion', lambda: frame_motion(self.keypoints))
+
+    def bbox_window_features(self, starts, window_size):
+        """Đặc trưng bbox (window_features) của các window [start, start + window_size)
+
+        Dùng chuỗi bbox đã cache (>= 1 điểm hợp lệ) và rolling_stats: chi phí theo số frame của subject, không theo số window.
+        """
+        series, valid = self.bbox(min_points=1)
+        return rolling_bbox_features(series, (series['center_x'], series['center_y']), valid, starts, window_size)
+
+    def window(self, start, end):
+        return PrimitiveWindow(self, start, end)
+
+
+class PrimitiveWindow:
+    """Window [start, end) trên FramePrimitives: trả về chuỗi giá trị hợp lệ đã tính sẵn"""
+
+    def __init__(self, primitives, start, end):
+        self.primitives = primitives
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return self.end - self.start
+
+    @property
+    def keypoints(self):
+        return self.primitives.keypoints[self.start:self.end]
+
+    def coords(self, kp):
+        """(M, 2): tọa độ các frame mà keypoint hợp lệ (giống dropna trên cặp cột x, y)"""
+        idx = KEYPOINT_INDEX[kp]
+        return self.keypoints[:, idx][self.primitives.keypoint_valid[self.start:self.end, idx]]
+
+    def coordinate_series(self, limit=None):
+        """[(tên cột, giá trị hợp lệ)] theo thứ tự cột tọa độ của DataFrame gốc"""
+        series = []
+        for col, kp_idx, axis in self.primitives.coordinate_order[:limit]:
+            values = self.keypoints[:, kp_idx, axis]
+            series.append((col, values[~np.isnan(values)]))
+        return series
+
+    def _in_window(self, previous):
+        return previous[self.start:self.end] >= self.start
+
+    def velocity(self, kp):
+        """Vận tốc giữa các frame hợp lệ liên tiếp trong window (giống np.diff sau dropna)"""
+        idx = KEYPOINT_INDEX[kp]
+        velocity = self.primitives.velocity[self.start:self.end, idx]
+        return velocity[self._in_window(self.primitives.previous_valid[:, idx]) & ~np.isnan(velocity)]
+
+    def acceleration(self, kp):
+        """Hiệu các vận tốc liên tiếp trong window (giống np.diff(velocity))"""
+        idx = KEYPOINT_INDEX[kp]
+        previous = self.primitives.previous_valid[:, idx]
+        acceleration = self.primitives.acceleration[self.start:self.end, idx]
+        # Cần cả hai vận tốc nằm trong window: frame trước của frame trước >= start
+        previous2 = np.where(previous >= 0, previous[np.maximum(previous, 0)], -1)
+        return acceleration[self._in_window(previous2) & ~np.isnan(acceleration)]
+
+    def bbox(self, metric, min_points=1):
+        """Giá trị bbox metric tại các frame hợp lệ của window"""
+        series, valid = self.primitives.bbox(min_points)
+        return series[metric][self.start:self.end][valid[self.start:self.end]]
+
+    def hip_centers(self):
+        """(M, 2): tâm hông của các frame có tâm (đã bỏ frame thiếu)"""
+        center, valid = self.primitives.hip_center
+        return center[self.start:self.end][valid[self.start:self.end]]
+
+    def distance_to_hip_center(self, kp):
+        """Khoảng cách keypoint -> tâm hông
+
+        Giống bản iterrows: tâm thứ i (sau khi bỏ frame thiếu tâm) ghép với frame thứ i của window.
+        """
+
+        centers = self.hip_centers()
+        idx = KEYPOINT_INDEX[kp]
+        coords = self.keypoints[:len(centers), idx]
+        valid = self.primitives.keypoint_valid[self.start:self.start + len(centers), idx]
+        delta = coords - centers
+        return np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)[valid]
+
+    def distance(self, kp1, kp2):
+        values = self.primitives.distance(kp1, kp2)[self.start:self.end]
+        return values[~np.isnan(values)]
+
+    def angle(self, kp1, kp2, kp3):
+        values = self.primitives.angle(kp1, kp2, kp3)[self.start:self.end]
+        return values[~np.isnan(values)]
+
+    @property
+    def frame_motion(self):
+        """Motion của các frame 1..len-1 trong window"""
+        return self.primitives.frame_motion[self.start:self.end - 1]
+
+
+def as_primitive_window(window_data):
+    """PrimitiveWindow giữ nguyên; DataFrame một window -> PrimitiveWindow trên cache riêng"""
+
+    if isinstance(window_data, PrimitiveWindow):
+        return window_data
+    if isinstance(window_data, pd.DataFrame):
+        primitives = FramePrimitives(keypoints_from_dataframe(window_data), coordinate_columns(window_data.columns))
+        return primitives.window(0, len(window_data))
+    raise TypeError(f"Không hỗ trợ window kiểu {type(window_data).__name__}")
@@ -15,43 +15,62 @@ Date: 2024
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import hashlib
+import json
 import os
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
-# Thiết lập matplotlib
-plt.rcParams['font.size'] = 10
-plt.rcParams['figure.figsize'] = (12, 8)
-sns.set_style("whitegrid")
+from keypoint_store import KeypointStore, file_checksum
+from recording_stats import scan_recording, RecordingStatsCache
+from dataset_manifest import DatasetManifest
+
+CHART_METHODS = (
+    '_create_activity_distribution_chart',
+    '_create_keypoint_quality_chart',
+    '_create_summary_chart',
+)
+
+CHART_FILES = (
+    'activity_distribution_analysis.png',
+    'keypoint_quality_analysis.png',
+    'comprehensive_summary.png',
+)
+
+REPORT_FILE = 'output/comprehensive_analysis_report.md'
+
+# Cache kết quả phân tích (thống kê theo checksum + dấu vết input của biểu đồ/báo cáo)
+ANALYSIS_CACHE_DIR = 'output/.analysis_cache'
+OUTPUTS_STAMP_FILE = os.path.join(ANALYSIS_CACHE_DIR, 'outputs.json')
+
+
+def _import_plotting():
+    """Import matplotlib (backend Agg, không cần GUI) + seaborn khi thật sự vẽ biểu đồ"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    
+    # Thiết lập matplotlib
+    plt.rcParams['font.size'] = 10
+    plt.rcParams['figure.figsize'] = (12, 8)
+    sns.set_style("whitegrid")
+    return plt
+
 
 class ISASAnalyzer:
     """Lớp phân tích dữ liệu ISAS Challenge 2025"""
     
     def __init__(self):
-        self.data_info = {
-            'keypoint_files': [
-                ('User 1', 'Train_Data/keypoint/video_1.csv'),
-                ('User 2', 'Train_Data/keypoint/video_2.csv'),
-                ('User 3', 'Train_Data/keypoint/video_3.csv'),
-                ('User 5', 'Train_Data/keypoint/video_5.csv')
-            ],
-            'label_files': [
-                ('User 1', 'Train_Data/keypointlabel/keypoints_with_labels_1.csv'),
-                ('User 2', 'Train_Data/keypointlabel/keypoints_with_labels_2.csv'),
-                ('User 3', 'Train_Data/keypointlabel/keypoints_with_labels_3.csv'),
-                ('User 5', 'Train_Data/keypointlabel/keypoints_with_labels_5.csv')
-            ],
-            'timetable_files': [
-                ('User 1', 'Train_Data/timetable/csv/1.csv'),
-                ('User 2', 'Train_Data/timetable/csv/2.csv'),
-                ('User 3', 'Train_Data/timetable/csv/3.csv'),
-                ('User 5', 'Train_Data/timetable/csv/5.csv')
-            ]
-        }
+        # Cache dạng cột cho keypoint CSV (tránh parse lại nhiều lần)
+        self.keypoint_store = KeypointStore()
+        
+        # Subjects và file dữ liệu được tìm tự động trong Train_Data (index cache)
+        self.manifest = DatasetManifest('Train_Data', keypoint_store=self.keypoint_store)
         
         # Định nghĩa activities
         self.normal_activities = {'sitting_quietly', 'using_phone', 'walking', 'eating_snacks', 'eating'}
@@ -63,6 +82,100 @@ class ISASAnalyzer:
         self.all_activities = Counter()
         self.keypoint_stats = {}
         
+        # Thống kê theo file (một lần duyệt, dùng chung cho overview/activities/quality)
+        self.recording_stats = {}
+        
+        # Thống kê đã tính được lưu theo checksum nội dung (chỉ duyệt lại file mới/thay đổi)
+        self.stats_cache = RecordingStatsCache(os.path.join(ANALYSIS_CACHE_DIR, 'stats'))
+        self.incremental = True
+        
+        # Độ phân giải biểu đồ PNG
+        self.chart_dpi = 300
+        
+    def __getstate__(self):
+        # Không gửi recording (memory-map) sang process khác khi vẽ biểu đồ song song
+        state = self.__dict__.copy()
+        state['recording_stats'] = {}
+        return state
+    
+    def get_recording_stats(self, file_path):
+        """Load recording và thống kê của file (chỉ duyệt file một lần)"""
+        
+        if file_path not in self.recording_stats:
+            recording = self.keypoint_store.load(file_path)
+            stats = self.stats_cache.get(recording.checksum) if self.incremental else None
+            if stats is None:
+                stats = scan_recording(recording)
+                self.stats_cache.put(recording.checksum, stats)
+            self.recording_stats[file_path] = (recording, stats)
+        
+        return self.recording_stats[file_path]
+    
+    @property
+    def data_info(self):
+        """Đường dẫn file theo user (keypoint / label / timetable), lấy từ manifest"""
+        return self.manifest.data_info()
+    
+    def get_user_files(self):
+        """Gom file keypoint/label theo user (giữ thứ tự trong data_info)"""
+        
+        user_files = {}
+        for file_key in ('keypoint_files', 'label_files'):
+            for user_name, file_path in self.data_info[file_key]:
+                user_files.setdefault(user_name, []).append((file_path, file_key == 'label_files'))
+        return user_files
+    
+    def file_checksum(self, file_path):
+        """Checksum nội dung của file: từ entry manifest nếu có, không thì đọc file"""
+        relative = os.path.relpath(file_path, self.manifest.data_root).replace(os.sep, '/')
+        entry = self.manifest.entries.get(relative)
+        return entry['checksum'] if entry is not None else file_checksum(file_path)
+    
+    def prefetch_recording_stats(self, workers=None):
+        """Build cache + thống kê của từng user song song trên nhiều process
+        
+        Mỗi worker xử lý toàn bộ file của một user; kết quả được ghép vào
+        self.recording_stats theo thứ tự user trong data_info nên các bước
+        phân tích sau đó cho kết quả giống hệt khi chạy tuần tự.
+        """
+        
+        user_files = self.get_user_files()
+        
+        # User có toàn bộ thống kê trong cache thì không cần gửi sang worker
+        # (checksum lấy từ manifest, không load / build cache recording trong process chính)
+        if self.incremental:
+            for user_name in list(user_files):
+                label_files = [file_path for file_path, is_label_file in user_files[user_name]
+                               if is_label_file and os.path.exists(file_path)]
+                if all(self.stats_cache.get(self.file_checksum(file_path)) is not None
+                       for file_path in label_files):
+                    del user_files[user_name]
+            if not user_files:
+                print("♻️ Thống kê của tất cả users đã có trong cache")
+                return
+        
+        workers = min(workers or os.cpu_count() or 1, len(user_files)) or 1
+        
+        print(f"⚡ Phân tích song song {len(user_files)} users với {workers} workers...")
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {user_name: executor.submit(_scan_user_files, self.keypoint_store, files)
+                       for user_name, files in user_files.items()}
+            
+            # Ghép kết quả theo thứ tự cố định (không theo thứ tự hoàn thành)
+            for user_name, future in futures.items():
+                try:
+                    user_stats = future.result()
+                except Exception as e:
+                    print(f"❌ {user_name}: Lỗi khi phân tích song song ({e}) - sẽ chạy lại tuần tự")
+                    continue
+                
+                for file_path, stats in user_stats.items():
+                    if stats is not None and file_path not in self.recording_stats:
+                        recording = self.keypoint_store.load(file_path)
+                        self.stats_cache.put(recording.checksum, stats)
+                        self.recording_stats[file_path] = (recording, stats)
+    
     def ensure_output_dir(self):
         """Đảm bảo thư mục output tồn tại"""
         if not os.path.exists('output'):
@@ -90,78 +203,85 @@ class ISASAnalyzer:
         # Kiểm tra keypoint files
         print("\n📊 Keypoint Files:")
         total_frames = 0
-        for user_name, file_path in self.data_info['keypoint_files']:
-            if os.path.exists(file_path):
-                df = pd.read_csv(file_path)
-                duration_minutes = df.shape[0] / 30 / 60
-                total_frames += df.shape[0]
+        for subject_id in self.manifest.subjects:
+            user_name = self.manifest.user_name(subject_id)
+            
+            # Số frame và cột lấy từ index, không cần mở file
+            entry = self.manifest.get_entry(subject_id, 'keypoint')
+            if entry is not None:
+                n_frames = entry['n_frames']
+                duration_minutes = n_frames / 30 / 60
+                total_frames += n_frames
                 
                 self.validation_results['keypoint_data'][user_name] = {
-                    'shape': df.shape,
-                    'duration_seconds': df.shape[0] / 30,
+                    'shape': (n_frames, len(entry['columns'])),
+                    'duration_seconds': n_frames / 30,
                     'has_data': True,
-                    'columns': list(df.columns)
+                    'columns': list(entry['columns'])
                 }
-                print(f"✅ {user_name}: {df.shape[0]:,} frames ({duration_minutes:.1f} phút)")
+                print(f"✅ {user_name}: {n_frames:,} frames ({duration_minutes:.1f} phút)")
             else:
                 self.validation_results['keypoint_data'][user_name] = {'has_data': False}
                 print(f"❌ {user_name}: File không tồn tại")
         
         # Kiểm tra label files
         print("\n🏷️ Label Files:")
-        for user_name, file_path in self.data_info['label_files']:
-            if os.path.exists(file_path):
-                df = pd.read_csv(file_path)
+        for subject_id in self.manifest.subjects:
+            user_name = self.manifest.user_name(subject_id)
+            file_path = self.manifest.file_path(subject_id, 'label')
+            
+            if self.manifest.get_entry(subject_id, 'label') is not None:
+                recording, stats = self.get_recording_stats(file_path)
+                n_frames = len(recording)
                 
-                # Tìm cột Action Label
-                action_cols = [col for col in df.columns if 'Action' in col and 'Label' in col]
-                has_action_label = len(action_cols) > 0
+                # Cột Action Label đã được xác định khi build cache
+                has_action_label = recording.label_column is not None
                 
                 if has_action_label:
-                    action_col = action_cols[0]
-                    valid_labels = df[action_col].dropna()
-                    valid_labels = valid_labels.astype(str).str.strip()
-                    valid_labels = valid_labels[valid_labels != 'None']
+                    activity_counts = Counter()
+                    for label, count in zip(recording.label_names, stats.label_counts):
+                        label = label.strip()
+                        if label != 'None' and count > 0:
+                            activity_counts[label] += int(count)
                     
-                    activity_counts = Counter(valid_labels)
                     unique_activities = len(activity_counts)
-                    missing_labels = df[action_col].isna().sum()
-                    none_labels = (df[action_col].astype(str).str.strip() == 'None').sum()
-                    total_missing = missing_labels + none_labels
+                    total_missing = n_frames - sum(activity_counts.values())
                 else:
                     activity_counts = Counter()
                     unique_activities = 0
-                    total_missing = len(df)
+                    total_missing = n_frames
                 
                 self.validation_results['label_data'][user_name] = {
-                    'shape': df.shape,
+                    'shape': recording.shape,
                     'has_action_label': has_action_label,
                     'unique_activities': unique_activities,
                     'activity_counts': activity_counts,
                     'missing_labels': total_missing,
-                    'missing_percentage': (total_missing / len(df)) * 100 if len(df) > 0 else 0,
+                    'missing_percentage': (total_missing / n_frames) * 100 if n_frames > 0 else 0,
                     'has_data': True
                 }
                 
                 status = "✅" if has_action_label else "⚠️"
-                print(f"{status} {user_name}: {df.shape[0]:,} frames, {unique_activities} hoạt động")
+                print(f"{status} {user_name}: {n_frames:,} frames, {unique_activities} hoạt động")
                 if total_missing > 0:
-                    print(f"   ❌ Missing/None labels: {total_missing:,} ({total_missing/len(df)*100:.1f}%)")
+                    print(f"   ❌ Missing/None labels: {total_missing:,} ({total_missing/n_frames*100:.1f}%)")
             else:
                 self.validation_results['label_data'][user_name] = {'has_data': False}
                 print(f"❌ {user_name}: File không tồn tại")
         
         # Kiểm tra timetable files
         print("\n⏰ Timetable Files:")
-        for user_name, file_path in self.data_info['timetable_files']:
-            if os.path.exists(file_path):
-                df = pd.read_csv(file_path)
+        for subject_id in self.manifest.subjects:
+            user_name = self.manifest.user_name(subject_id)
+            
+            entry = self.manifest.get_entry(subject_id, 'timetable')
+            if entry is not None:
                 self.validation_results['timetable_data'][user_name] = {
-                    'shape': df.shape,
-                    'columns': list(df.columns),
+                    'shape': (entry['n_frames'], len(entry['columns'])),
+                    'columns': list(entry['columns']),
                     'has_data': True
                 }
-                print(f"✅ {user_name}: {df.shape[0]} entries")
+                print(f"✅ {user_name}: {entry['n_frames']} entries")
             else:
                 self.validation_results['timetable_data'][user_name] = {'has_data': False}
                 print(f"❌ {user_name}: File không tồn tại")
@@ -249,53 +369,28 @@ class ISASAnalyzer:
         
         self.keypoint_stats = {}
         
-        for user_name in ['User 1', 'User 2', 'User 3', 'User 5']:
-            file_path = f"Train_Data/keypointlabel/keypoints_with_labels_{user_name.split()[1]}.csv"
+        for subject_id in self.manifest.subjects:
+            user_name = self.manifest.user_name(subject_id)
+            file_path = self.manifest.file_path(subject_id, 'label')
             
-            if os.path.exists(file_path):
-                df = pd.read_csv(file_path)
-                
-                # Lấy keypoint columns
-                keypoint_cols = [col for col in df.columns if any(kp in col.lower() for kp in 
-                               ['nose', 'eye', 'ear', 'shoulder', 'elbow', 'wrist', 'hip', 'knee', 'ankle'])]
-                
-                # Tính missing values
-                missing_count = df[keypoint_cols].isnull().sum().sum()
-                total_values = len(keypoint_cols) * len(df)
-                missing_pct = (missing_count / total_values * 100) if total_values > 0 else 0
-                
-                # Phân tích tọa độ
-                x_cols = [col for col in keypoint_cols if col.endswith('_x')]
-                y_cols = [col for col in keypoint_cols if col.endswith('_y')]
-                
-                x_values = df[x_cols].values.flatten()
-                y_values = df[y_cols].values.flatten()
-                
-                # Loại bỏ NaN
-                x_values = x_values[~np.isnan(x_values)]
-                y_values = y_values[~np.isnan(y_values)]
-                
-                # Tính movement
-                movement_x = movement_y = 0
-                if 'nose_x' in df.columns and 'nose_y' in df.columns:
-                    nose_x = df['nose_x'].dropna()
-                    nose_y = df['nose_y'].dropna()
-                    if len(nose_x) > 1:
-                        movement_x = np.abs(nose_x.diff()).mean()
-                        movement_y = np.abs(nose_y.diff()).mean()
+            if self.manifest.get_entry(subject_id, 'label') is not None:
+                # Dùng lại thống kê từ lần duyệt ở bước overview (nếu có)
+                recording, stats = self.get_recording_stats(file_path)
+                missing_pct = stats.missing_percentage
+                movement_x, movement_y = stats.movement
                 
                 self.keypoint_stats[user_name] = {
-                    'total_frames': len(df),
+                    'total_frames': len(recording),
                     'missing_percentage': missing_pct,
-                    'x_range': (x_values.min(), x_values.max()) if len(x_values) > 0 else (0, 0),
-                    'y_range': (y_values.min(), y_values.max()) if len(y_values) > 0 else (0, 0),
+                    'x_range': (stats.x_min, stats.x_max) if stats.x_min is not None else (0, 0),
+                    'y_range': (stats.y_min, stats.y_max) if stats.y_min is not None else (0, 0),
                     'movement_x': movement_x,
                     'movement_y': movement_y,
-                    'video_resolution': (x_values.max(), y_values.max()) if len(x_values) > 0 and len(y_values) > 0 else (0, 0)
+                    'video_resolution': (stats.x_max, stats.y_max) if stats.x_max is not None and stats.y_max is not None else (0, 0)
                 }
                 
                 print(f"\n{user_name}:")
-                print(f"  📊 Total frames: {len(df):,}")
+                print(f"  📊 Total frames: {len(recording):,}")
                 print(f"  ❌ Missing values: {missing_pct:.3f}%")
                 print(f"  📺 Resolution: {self.keypoint_stats[user_name]['video_resolution'][0]:.0f} × {self.keypoint_stats[user_name]['video_resolution'][1]:.0f}")
                 print(f"  🏃 Movement: X={movement_x:.2f}, Y={movement_y:.2f} pixels/frame")
@@ -326,26 +421,33 @@ class ISASAnalyzer:
         
         print(f"  ⭐ Đánh giá tổng thể: {overall_quality}")
     
-    def create_visualizations(self, charts_dir):
+    def create_visualizations(self, charts_dir, workers=1):
         """Tạo các biểu đồ visualization"""
         
         print("\n📊 4. TẠO BIỂU ĐỒ VISUALIZATION")
         print("=" * 50)
         
         # Biểu đồ 1: Phân phối hoạt động
-        self._create_activity_distribution_chart(charts_dir)
-        
         # Biểu đồ 2: Chất lượng keypoints
-        self._create_keypoint_quality_chart(charts_dir)
-        
         # Biểu đồ 3: Tổng kết
-        self._create_summary_chart(charts_dir)
+        if workers is None or workers > 1:
+            # Mỗi biểu đồ vẽ trong một process riêng (backend Agg)
+            max_workers = min(workers or os.cpu_count() or 1, len(CHART_METHODS))
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(_render_chart, self, method_name, charts_dir) for method_name in CHART_METHODS]
+                for future in futures:
+                    future.result()
+        else:
+            for method_name in CHART_METHODS:
+                getattr(self, method_name)(charts_dir)
         
-        print(f"✅ Đã tạo 3 biểu đồ trong {charts_dir}/")
+        print(f"✅ Đã tạo {len(CHART_METHODS)} biểu đồ trong {charts_dir}/ (dpi={self.chart_dpi})")
     
     def _create_activity_distribution_chart(self, charts_dir):
         """Tạo biểu đồ phân phối hoạt động"""
         
+        plt = _import_plotting()
+        
         plt.figure(figsize=(15, 10))
         
         # Subplot 1: Bar chart các hoạt động
@@ -418,12 +520,14 @@ class ISASAnalyzer:
             plt.text(i, duration + max(durations)*0.01, f'{duration:.1f}m', ha='center', va='bottom')
         
         plt.tight_layout()
-        plt.savefig(f'{charts_dir}/activity_distribution_analysis.png', dpi=300, bbox_inches='tight')
+        plt.savefig(f'{charts_dir}/activity_distribution_analysis.png', dpi=self.chart_dpi, bbox_inches='tight')
         plt.close()
     
     def _create_keypoint_quality_chart(self, charts_dir):
         """Tạo biểu đồ chất lượng keypoints"""
         
+        plt = _import_plotting()
+        
         plt.figure(figsize=(15, 10))
         
         users = list(self.keypoint_stats.keys())
@@ -504,12 +608,14 @@ class ISASAnalyzer:
                     f'{score:.0f}', ha='center', va='bottom')
         
         plt.tight_layout()
-        plt.savefig(f'{charts_dir}/keypoint_quality_analysis.png', dpi=300, bbox_inches='tight')
+        plt.savefig(f'{charts_dir}/keypoint_quality_analysis.png', dpi=self.chart_dpi, bbox_inches='tight')
         plt.close()
     
     def _create_summary_chart(self, charts_dir):
         """Tạo biểu đồ tổng kết"""
         
+        plt = _import_plotting()
+        
         fig, axes = plt.subplots(2, 2, figsize=(16, 12))
         fig.suptitle('TỔNG KẾT PHÂN TÍCH DỮ LIỆU ISAS CHALLENGE 2025', fontsize=16, fontweight='bold')
         
@@ -579,7 +685,7 @@ class ISASAnalyzer:
                     f'{count:,}', ha='left', va='center', fontsize=9)
         
         plt.tight_layout()
-        plt.savefig(f'{charts_dir}/comprehensive_summary.png', dpi=300, bbox_inches='tight')
+        plt.savefig(f'{charts_dir}/comprehensive_summary.png', dpi=self.chart_dpi, bbox_inches='tight')
         plt.close()
     
     def generate_report(self, charts_dir):
@@ -728,12 +834,67 @@ Các biểu đồ đã được tạo và lưu trong thư mục `output/charts/`
 """
         
         # Lưu báo cáo
-        with open('output/comprehensive_analysis_report.md', 'w', encoding='utf-8') as f:
+        with open(REPORT_FILE, 'w', encoding='utf-8') as f:
             f.write(report_content)
         
-        print(f"✅ Báo cáo đã được lưu: output/comprehensive_analysis_report.md")
+        print(f"✅ Báo cáo đã được lưu: {REPORT_FILE}")
+    
+    def results_digest(self, *extra):
+        """Hash các kết quả phân tích (input của biểu đồ và báo cáo)"""
+        
+        payload = [self.validation_results, self.user_stats, self.all_activities, self.keypoint_stats, list(extra)]
+        content = json.dumps(payload, sort_keys=True, default=_json_default)
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+    
+    def _load_output_stamps(self):
+        try:
+            with open(OUTPUTS_STAMP_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def is_output_fresh(self, name, digest, files):
+        """Output đã được tạo từ đúng input này và các file vẫn còn"""
+        
+        if not self.incremental:
+            return False
+        return self._load_output_stamps().get(name) == digest and all(os.path.exists(path) for path in files)
+    
+    def mark_output(self, name, digest):
+        """Ghi lại digest input của output vừa tạo"""
+        
+        stamps = self._load_output_stamps()
+        stamps[name] = digest
+        os.makedirs(ANALYSIS_CACHE_DIR, exist_ok=True)
+        with open(OUTPUTS_STAMP_FILE, 'w', encoding='utf-8') as f:
+            json.dump(stamps, f, indent=2)
+    
+    def update_visualizations(self, charts_dir, workers=1):
+        """Tạo biểu đồ nếu input (kết quả phân tích, dpi) đã thay đổi"""
+        
+        charts_digest = self.results_digest('charts', self.chart_dpi)
+        chart_files = [os.path.join(charts_dir, name) for name in CHART_FILES]
+        if self.is_output_fresh('charts', charts_digest, chart_files):
+            print("\n♻️ Biểu đồ không đổi (input giống lần chạy trước) - bỏ qua bước vẽ")
+            return False
+        
+        self.create_visualizations(charts_dir, workers)
+        self.mark_output('charts', charts_digest)
+        return True
     
-    def run_complete_analysis(self):
+    def update_report(self, charts_dir):
+        """Tạo báo cáo nếu kết quả phân tích đã thay đổi"""
+        
+        report_digest = self.results_digest('report', charts_dir)
+        if self.is_output_fresh('report', report_digest, [REPORT_FILE]):
+            print("\n♻️ Báo cáo không đổi (input giống lần chạy trước) - giữ nguyên file cũ")
+            return False
+        
+        self.generate_report(charts_dir)
+        self.mark_output('report', report_digest)
+        return True
+    
+    def run_complete_analysis(self, workers=1, charts=True):
         """Chạy phân tích hoàn chỉnh"""
         
         print("🚀 BẮT ĐẦU PHÂN TÍCH HOÀN CHỈNH DỮ LIỆU ISAS CHALLENGE 2025")
@@ -743,12 +904,21 @@ Các biểu đồ đã được tạo và lưu trong thư mục `output/charts/`
         charts_dir = self.ensure_output_dir()
         
         try:
+            # Duyệt file của các user song song (workers > 1)
+            if workers is None or workers > 1:
+                self.prefetch_recording_stats(workers)
+            
             # Chạy tất cả phân tích
             self.run_data_overview()
             self.analyze_activities()
             self.analyze_keypoint_quality()
-            self.create_visualizations(charts_dir)
-            self.generate_report(charts_dir)
+            
+            # Biểu đồ / báo cáo chỉ tạo lại khi input thay đổi
+            if charts:
+                self.update_visualizations(charts_dir, workers)
+            else:
+                print("\n⏭️ Bỏ qua bước tạo biểu đồ (--no-charts)")
+            self.update_report(charts_dir)
             
             print(f"\n🎉 HOÀN THÀNH PHÂN TÍCH TỔNG QUAN!")
             print("=" * 70)
@@ -770,14 +940,56 @@ Các biểu đồ đã được tạo và lưu trong thư mục `output/charts/`
             traceback.print_exc()
 
 
+def _json_default(value):
+    """Chuyển kiểu numpy / set sang kiểu JSON để hash kết quả"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return str(value)
+
+
+def _render_chart(analyzer, method_name, charts_dir):
+    """Worker: vẽ một biểu đồ (chạy trong process con)"""
+    getattr(analyzer, method_name)(charts_dir)
+    return method_name
+
+
+def _scan_user_files(keypoint_store, files):
+    """Worker: build cache và thống kê các file của một user (chạy trong process con)"""
+    
+    user_stats = {}
+    for file_path, is_label_file in files:
+        if not os.path.exists(file_path):
+            continue
+        recording = keypoint_store.load(file_path)
+        user_stats[file_path] = scan_recording(recording) if is_label_file else None
+    return user_stats
+
+
 def main():
     """Hàm main chạy phân tích"""
     
+    parser = argparse.ArgumentParser(description="Phân tích dữ liệu ISAS Challenge 2025")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Số process phân tích song song theo user (0 = số CPU, 1 = tuần tự)")
+    parser.add_argument('--no-charts', action='store_true',
+                        help="Không vẽ biểu đồ (không import matplotlib/seaborn)")
+    parser.add_argument('--dpi', type=int, default=300,
+                        help="Độ phân giải biểu đồ PNG (mặc định: 300)")
+    parser.add_argument('--force', action='store_true',
+                        help="Bỏ qua cache, tính lại thống kê và tạo lại biểu đồ/báo cáo")
+    args = parser.parse_args()
+    
     # Khởi tạo analyzer
     analyzer = ISASAnalyzer()
+    analyzer.chart_dpi = args.dpi
+    analyzer.incremental = not args.force
     
     # Chạy phân tích hoàn chỉnh
-    analyzer.run_complete_analysis()
+    analyzer.run_complete_analysis(workers=args.workers or None, charts=not args.no_charts)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,357 @@
+"""
+ISAS Challenge 2025 - Keypoint Store
+Cache dạng cột (columnar) cho các file keypoint CSV
+
+Tính năng:
+- Chuyển CSV sang mảng float32 (frames × 17 × 2) một lần duy nhất
+- Lưu sidecar .npy cạnh file CSV, đọc lại bằng memory-map
+- Lưu nhãn (mã số + từ điển) và cột frame_id/timestamp
+- Tự động build lại cache khi mtime hoặc hash của CSV thay đổi
+- Build và đọc theo block (chunk) để RAM không phụ thuộc độ dài recording
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# 17 keypoints chuẩn COCO format
+KEYPOINT_NAMES = [
+    'nose', 'left_eye', 'right_eye', 'left_ear', 'right_ear',
+    'left_shoulder', 'right_shoulder', 'left_elbow', 'right_elbow',
+    'left_wrist', 'right_wrist', 'left_hip', 'right_hip',
+    'left_knee', 'right_knee', 'left_ankle', 'right_ankle'
+]
+
+CACHE_DIR_NAME = '.keypoint_cache'
+CACHE_VERSION = 1
+
+CSV_CHUNK_ROWS = 100_000       # Số dòng CSV parse mỗi lần khi build cache
+DEFAULT_BLOCK_SIZE = 65_536    # Số frame mỗi block khi đọc từ cache
+
+
+def resolve_keypoint_columns(columns):
+    """Map mỗi keypoint tới cặp cột (x, y), None nếu không tìm thấy"""
+
+    columns = list(columns)
+    mapping = []
+
+    for kp_name in KEYPOINT_NAMES:
+        x_col = f"{kp_name}_x" if f"{kp_name}_x" in columns else None
+        y_col = f"{kp_name}_y" if f"{kp_name}_y" in columns else None
+
+        # Fallback: tìm theo substring như cách cũ (cột cuối cùng khớp sẽ được chọn)
+        if x_col is None or y_col is None:
+            for col in columns:
+                col_lower = col.lower()
+                if kp_name in col_lower and '_x' in col_lower:
+                    x_col = col
+                elif kp_name in col_lower and '_y' in col_lower:
+                    y_col = col
+
+        mapping.append((x_col, y_col) if x_col is not None and y_col is not None else None)
+
+    return mapping
+
+
+def find_label_column(columns):
+    """Tìm cột Action Label"""
+    action_cols = [col for col in columns if 'Action' in col and 'Label' in col]
+    return action_cols[0] if action_cols else None
+
+
+def file_checksum(file_path, block_size=1 << 20):
+    """Tính SHA-1 của file (đọc theo block)"""
+    sha1 = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def csv_summary(file_path, block_size=1 << 20):
+    """Checksum, header và số dòng dữ liệu của CSV trong một lần đọc (không parse, không build cache)
+
+    Số dòng = số dòng sau header (giống len(DataFrame) với CSV keypoint không có dòng trống).
+    """
+
+    sha1 = hashlib.sha1()
+    n_lines = 0
+    last_block = b''
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha1.update(block)
+            n_lines += block.count(b'\n')
+            last_block = block
+    # Dòng cuối không có newline
+    if last_block and not last_block.endswith(b'\n'):
+        n_lines += 1
+
+    columns = list(pd.read_csv(file_path, nrows=0).columns) if n_lines > 0 else []
+    return {'n_frames': max(n_lines - 1, 0), 'columns': columns, 'checksum': sha1.hexdigest()}
+
+
+class KeypointRecording:
+    """Dữ liệu keypoint của một file CSV, đọc từ cache"""
+
+    def __init__(self, csv_path, keypoints, frame_ids, label_codes, meta):
+        self.csv_path = csv_path
+        self.keypoints = keypoints        # (N, 17, 2) float32, NaN = missing
+        self.frame_ids = frame_ids        # (N,) float64
+        self.label_codes = label_codes    # (N,) int32, -1 = NaN
+        self.label_names = meta['label_names']
+        self.label_column = meta['label_column']
+        self.columns = meta['columns']
+        self.checksum = meta['checksum']
+
+    def __len__(self):
+        return len(self.keypoints)
+
+    @property
+    def shape(self):
+        """Shape của DataFrame gốc"""
+        return (len(self.keypoints), len(self.columns))
+
+    def timestamps(self, fps=30):
+        """Thời gian (giây) của từng frame"""
+        return self.frame_ids / fps
+
+    def labels(self):
+        """Mảng nhãn dạng object (None cho frame không có nhãn)"""
+        names = np.array(list(self.label_names) + [None], dtype=object)
+        return names[self.label_codes]
+
+    def label_counts(self):
+        """Số frame theo từng mã nhãn (không tính NaN)"""
+        valid_codes = self.label_codes[self.label_codes >= 0]
+        return np.bincount(valid_codes, minlength=len(self.label_names))
+
+    def iter_blocks(self, block_size=DEFAULT_BLOCK_SIZE, start=0, end=None):
+        """Duyệt recording theo block frame liên tiếp
+
+        Yield (block_start, keypoints, frame_ids, label_codes); các mảng là view
+        của memory-map nên RAM chỉ phụ thuộc block_size.
+        """
+        end = len(self) if end is None else min(end, len(self))
+        for block_start in range(start, end, block_size):
+            block_end = min(block_start + block_size, end)
+            yield (block_start,
+                   self.keypoints[block_start:block_end],
+                   self.frame_ids[block_start:block_end],
+                   self.label_codes[block_start:block_end])
+
+    def to_dataframe(self):
+        """Dựng lại DataFrame (frame_id, keypoints, label) không cần parse CSV"""
+
+        data = {'frame_id': self.frame_ids}
+        for kp_idx, kp_name in enumerate(KEYPOINT_NAMES):
+            data[f"{kp_name}_x"] = self.keypoints[:, kp_idx, 0]
+            data[f"{kp_name}_y"] = self.keypoints[:, kp_idx, 1]
+        if self.label_column is not None:
+            data[self.label_column] = self.labels()
+
+        return pd.DataFrame(data)
+
+
+class KeypointStore:
+    """Quản lý cache .npy cho các file keypoint CSV"""
+
+    def __init__(self, cache_dir=None, verbose=True, chunk_rows=CSV_CHUNK_ROWS):
+        # None = sidecar trong thư mục .keypoint_cache cạnh file CSV
+        self.cache_dir = cache_dir
+        self.verbose = verbose
+        self.chunk_rows = chunk_rows
+
+    def _cache_paths(self, csv_path):
+        """Đường dẫn các file cache của một CSV"""
+        cache_dir = self.cache_dir or os.path.join(os.path.dirname(os.path.abspath(csv_path)), CACHE_DIR_NAME)
+        stem = os.path.splitext(os.path.basename(csv_path))[0]
+        base = os.path.join(cache_dir, stem)
+        return {
+            'dir': cache_dir,
+            'meta': f"{base}.meta.json",
+            'keypoints': f"{base}.keypoints.npy",
+            'frame_ids': f"{base}.frame_ids.npy",
+            'labels': f"{base}.labels.npy",
+        }
+
+    def _read_meta(self, paths):
+        if not os.path.exists(paths['meta']):
+            return None
+        try:
+            with open(paths['meta'], 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('version') != CACHE_VERSION:
+            return None
+        if not all(os.path.exists(paths[key]) for key in ('keypoints', 'frame_ids', 'labels')):
+            return None
+        return meta
+
+    def _write_meta(self, paths, meta):
+        tmp_path = f"{paths['meta']}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, paths['meta'])
+
+    def is_fresh(self, csv_path):
+        """Kiểm tra cache còn hợp lệ (mtime/size, hoặc hash nếu mtime đổi)"""
+
+        paths = self._cache_paths(csv_path)
+        meta = self._read_meta(paths)
+        if meta is None:
+            return False
+
+        stat = os.stat(csv_path)
+        if meta['source_mtime'] == stat.st_mtime and meta['source_size'] == stat.st_size:
+            return True
+
+        # mtime thay đổi nhưng nội dung có thể giữ nguyên (copy, touch...)
+        if meta['source_size'] == stat.st_size and meta['checksum'] == file_checksum(csv_path):
+            meta['source_mtime'] = stat.st_mtime
+            self._write_meta(paths, meta)
+            return True
+
+        return False
+
+    def cached_meta(self, csv_path):
+        """Meta của cache nếu còn hợp lệ (n_frames, columns, checksum...), None nếu chưa build"""
+        if not self.is_fresh(csv_path):
+            return None
+        return self._read_meta(self._cache_paths(csv_path))
+
+    def build(self, csv_path):
+        """Parse CSV theo chunk và ghi cache (RAM cố định theo chunk_rows)"""
+
+        paths = self._cache_paths(csv_path)
+        os.makedirs(paths['dir'], exist_ok=True)
+
+        stat = os.stat(csv_path)
+        checksum = file_checksum(csv_path)
+
+        # Pass 1: append từng chunk vào file raw tạm
+        raw_paths = {key: f"{paths[key]}.{os.getpid()}.raw" for key in ('keypoints', 'frame_ids', 'labels')}
+        columns = None
+        label_column = None
+        label_index = {}   # tên nhãn -> mã tạm (theo thứ tự xuất hiện)
+        n_frames = 0
+
+        try:
+            with open(raw_paths['keypoints'], 'wb') as kp_file, \
+                    open(raw_paths['frame_ids'], 'wb') as frame_file, \
+                    open(raw_paths['labels'], 'wb') as label_file:
+                for chunk in pd.read_csv(csv_path, chunksize=self.chunk_rows):
+                    if columns is None:
+                        columns = list(chunk.columns)
+                        keypoint_columns = resolve_keypoint_columns(columns)
+                        label_column = find_label_column(columns)
+
+                    keypoints, frame_ids, label_codes = self._convert_chunk(
+                        chunk, n_frames, keypoint_columns, label_column, label_index)
+                    kp_file.write(keypoints.tobytes())
+                    frame_file.write(frame_ids.tobytes())
+                    label_file.write(label_codes.tobytes())
+                    n_frames += len(chunk)
+
+            # CSV chỉ có header
+            if columns is None:
+                columns = list(pd.read_csv(csv_path, nrows=0).columns)
+                label_column = find_label_column(columns)
+
+            # Labels -> mã số + từ điển (sắp xếp như pd.factorize(sort=True))
+            label_names = sorted(label_index)
+            remap = np.empty(len(label_names), dtype=np.int32)
+            for code, name in enumerate(label_names):
+                remap[label_index[name]] = code
+
+            # Pass 2: chuyển raw -> .npy theo block, ghi file tạm rồi rename
+            # để tránh cache bị hỏng giữa chừng
+            specs = (
+                ('keypoints', np.float32, (n_frames, len(KEYPOINT_NAMES), 2)),
+                ('frame_ids', np.float64, (n_frames,)),
+                ('labels', np.int32, (n_frames,)),
+            )
+            for key, dtype, shape in specs:
+                tmp_path = f"{paths[key]}.{os.getpid()}.tmp.npy"
+                target = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=dtype, shape=shape)
+                if n_frames > 0:
+                    source = np.memmap(raw_paths[key], dtype=dtype, mode='r', shape=shape)
+                    for block_start in range(0, n_frames, DEFAULT_BLOCK_SIZE):
+                        block = source[block_start:block_start + DEFAULT_BLOCK_SIZE]
+                        if key == 'labels':
+                            block = np.where(block >= 0, remap[np.maximum(block, 0)] if len(remap) else -1, -1)
+                        target[block_start:block_start + DEFAULT_BLOCK_SIZE] = block
+                    del source
+                target.flush()
+                del target
+                os.replace(tmp_path, paths[key])
+        finally:
+            for raw_path in raw_paths.values():
+                if os.path.exists(raw_path):
+                    os.remove(raw_path)
+
+        meta = {
+            'version': CACHE_VERSION,
+            'source': os.path.abspath(csv_path),
+            'source_mtime': stat.st_mtime,
+            'source_size': stat.st_size,
+            'checksum': checksum,
+            'columns': columns,
+            'label_column': label_column,
+            'label_names': label_names,
+            'n_frames': n_frames,
+        }
+        self._write_meta(paths, meta)
+
+        if self.verbose:
+            print(f"💾 Đã build cache cho {csv_path} ({n_frames:,} frames)")
+
+        return meta
+
+    def _convert_chunk(self, chunk, offset, keypoint_columns, label_column, label_index):
+        """Chuyển một chunk DataFrame sang mảng keypoints / frame_ids / mã nhãn tạm"""
+
+        # Keypoints (n, 17, 2), giữ NaN để phân tích missing values
+        keypoints = np.full((len(chunk), len(KEYPOINT_NAMES), 2), np.nan, dtype=np.float32)
+        for kp_idx, cols in enumerate(keypoint_columns):
+            if cols is not None:
+                keypoints[:, kp_idx, :] = chunk[list(cols)].to_numpy(dtype=np.float32)
+
+        # Frame ids / timestamp
+        if 'frame_id' in chunk.columns:
+            frame_ids = pd.to_numeric(chunk['frame_id'], errors='coerce').to_numpy(dtype=np.float64)
+        else:
+            frame_ids = np.arange(offset, offset + len(chunk), dtype=np.float64)
+
+        # Labels -> mã tạm, từ điển mở rộng dần qua các chunk
+        label_codes = np.full(len(chunk), -1, dtype=np.int32)
+        if label_column is not None:
+            label_series = chunk[label_column]
+            valid = label_series.notna().to_numpy()
+            codes, uniques = pd.factorize(label_series[valid].astype(str))
+            chunk_lut = np.array([label_index.setdefault(str(name), len(label_index)) for name in uniques],
+                                 dtype=np.int32)
+            label_codes[valid] = chunk_lut[codes] if len(chunk_lut) else codes
+
+        return keypoints, frame_ids, label_codes
+
+    def load(self, csv_path):
+        """Load recording từ cache (build lại nếu cache cũ hoặc chưa có)"""
+
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(f"File không tồn tại: {csv_path}")
+
+        if not self.is_fresh(csv_path):
+            self.build(csv_path)
+
+        paths = self._cache_paths(csv_path)
+        meta = self._read_meta(paths)
+
+        keypoints = np.load(paths['keypoints'], mmap_mode='r')
+        frame_ids = np.load(paths['frame_ids'], mmap_mode='r')
+        label_codes = np.load(paths['labels'], mmap_mode='r')
+
+        return KeypointRecording(csv_path, keypoints, frame_ids, label_codes, meta)
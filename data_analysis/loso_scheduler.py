@@ -0,0 +1,181 @@
+"""
+ISAS Challenge 2025 - LOSO Scheduler
+Chạy song song các cặp (fold, model) của Leave-One-Subject-Out trong giới hạn CPU
+
+Tính năng:
+- Mỗi job = (subject test, model): clone model, fit trên các subject còn lại, predict subject test
+- CPU budget chia đều cho các job chạy đồng thời; n_jobs đã đặt của model và thread BLAS / OpenMP
+  trong worker bị giới hạn theo phần CPU của job (không oversubscription lồng nhau)
+- X, y ghi ra .npy một lần, worker mở bằng memmap thay vì nhận bản copy pickle
+- Đo wall time và đỉnh RSS của từng job, gộp lại theo fold
+- Kết quả ghép theo thứ tự fold / model cố định, không theo thứ tự hoàn thành
+"""
+
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.base import clone
+from threadpoolctl import threadpool_limits
+
+
+def cpu_allocation(n_jobs, cpu_budget=None):
+    """(số job chạy đồng thời, số thread cho mỗi job) trong cpu_budget CPU"""
+
+    cpu_budget = max(1, cpu_budget or os.cpu_count() or 1)
+    workers = max(1, min(cpu_budget, n_jobs))
+    return workers, max(1, cpu_budget // workers)
+
+
+def clone_for_fold(model, n_threads):
+    """Clone chưa fit của model, các tham số n_jobs đã đặt (khác None, kể cả estimator con) = n_threads
+
+    n_jobs=None không tạo song song joblib (hoặc không được dùng, vd. LogisticRegression) nên giữ nguyên;
+    thread BLAS / OpenMP đã bị giới hạn bởi threadpool_limits trong worker.
+    """
+
+    fold_model = clone(model)
+    thread_params = {name: n_threads for name, value in fold_model.get_params().items()
+                     if (name == 'n_jobs' or name.endswith('__n_jobs')) and value is not None}
+    if thread_params:
+        fold_model.set_params(**thread_params)
+    return fold_model
+
+
+def current_rss_mb():
+    """RSS hiện tại của process (MB), None nếu nền tảng không hỗ trợ"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class PeakMemory:
+    """Đỉnh RSS (MB) của process trong khối with, lấy mẫu mỗi interval giây"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_mb = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is not None:
+            self.peak_mb = rss if self.peak_mb is None else max(self.peak_mb, rss)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        if self.peak_mb is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._sample()
+        return False
+
+
+def _run_fold_job(X_source, y_source, test_index, model, n_threads):
+    """Worker: fit model trên các subject train, predict subject test (X/y là mảng hoặc file .npy)"""
+
+    X = np.load(X_source, mmap_mode='r') if isinstance(X_source, str) else X_source
+    y = np.load(y_source, mmap_mode='r') if isinstance(y_source, str) else y_source
+    test_mask = np.zeros(len(y), dtype=bool)
+    test_mask[test_index] = True
+
+    started = time.time()
+    with PeakMemory() as memory, threadpool_limits(limits=n_threads):
+        fold_model = clone_for_fold(model, n_threads)
+        fold_model.fit(X[~test_mask], y[~test_mask])
+        y_pred = fold_model.predict(X[test_mask])
+
+    return {
+        'y_pred': y_pred,
+        'started': started,
+        'finished': time.time(),
+        'peak_memory_mb': memory.peak_mb,
+    }
+
+
+def summarize_folds(job_results):
+    """Gộp theo fold: wall time (job đầu bắt đầu -> job cuối xong), tổng thời gian job, đỉnh RSS"""
+
+    folds = {}
+    for (test_subject, _), result in job_results.items():
+        if isinstance(result, Exception):
+            continue
+        fold = folds.setdefault(test_subject, {'started': result['started'], 'finished': result['finished'],
+                                               'job_time': 0.0, 'peak_memory_mb': None})
+        fold['started'] = min(fold['started'], result['started'])
+        fold['finished'] = max(fold['finished'], result['finished'])
+        fold['job_time'] += result['finished'] - result['started']
+        if result['peak_memory_mb'] is not None:
+            fold['peak_memory_mb'] = max(fold['peak_memory_mb'] or 0.0, result['peak_memory_mb'])
+
+    return {subject: {'wall_time': fold['finished'] - fold['started'],
+                      'job_time': fold['job_time'],
+                      'peak_memory_mb': fold['peak_memory_mb']}
+            for subject, fold in folds.items()}
+
+
+def run_loso_jobs(X, y, subjects, models, cpu_budget=None, verbose=True):
+    """Chạy mọi cặp (subject test, model) của LOSO
+
+    Trả về {(subject, tên model): {'y_pred', 'started', 'finished', 'peak_memory_mb'} hoặc Exception},
+    theo thứ tự subject tăng dần rồi thứ tự models.
+    """
+
+    X = np.asarray(X)
+    y = np.asarray(y)
+    subjects = np.asarray(subjects)
+
+    jobs = [(test_subject, model_name) for test_subject in sorted(np.unique(subjects))
+            for model_name in models]
+    test_indices = {test_subject: np.flatnonzero(subjects == test_subject) for test_subject, _ in jobs}
+    workers, n_threads = cpu_allocation(len(jobs), cpu_budget)
+
+    results = {}
+    if workers == 1:
+        for test_subject, model_name in jobs:
+            try:
+                results[(test_subject, model_name)] = _run_fold_job(X, y, test_indices[test_subject],
+                                                                    models[model_name], n_threads)
+            except Exception as e:
+                results[(test_subject, model_name)] = e
+        return results
+
+    if verbose:
+        print(f"⚡ LOSO song song {len(jobs)} jobs (fold × model) với {workers} workers × {n_threads} threads...")
+
+    with tempfile.TemporaryDirectory(prefix='isas_loso_') as tmp_dir:
+        # X, y ghi ra đĩa một lần; worker chỉ mở memmap
+        X_path = os.path.join(tmp_dir, 'X.npy')
+        y_path = os.path.join(tmp_dir, 'y.npy')
+        np.save(X_path, X)
+        np.save(y_path, y)
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {job: executor.submit(_run_fold_job, X_path, y_path, test_indices[job[0]],
+                                            models[job[1]], n_threads)
+                       for job in jobs}
+
+            # Ghép kết quả theo thứ tự cố định (không theo thứ tự hoàn thành)
+            for job, future in futures.items():
+                try:
+                    results[job] = future.result()
+                except Exception as e:
+                    results[job] = e
+
+    return results
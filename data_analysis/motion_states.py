@@ -0,0 +1,126 @@
+"""
+ISAS Challenge 2025 - Motion States
+Phân tích 3 trạng thái chuyển động (still / stop / moving) bằng mảng NumPy
+
+Tính năng:
+- Motion từng frame (trung bình |Δ tọa độ| so với frame trước) tính một lần cho cả subject
+- Ngưỡng động theo window (mean ± 0.5 std), phân loại trạng thái bằng mask
+- Thời lượng, trạng thái chính và số lần chuyển trạng thái (ranh giới run-length)
+  cho mọi window cùng lúc
+- Kết quả giống ISAS3StateFeatureEngineer.analyze_motion_states (bản iloc)
+"""
+
+import numpy as np
+
+from window_builder import sliding_windows, window_starts
+
+# Mã trạng thái (giống state_mapping của notebook)
+STATE_STILL, STATE_STOP, STATE_MOVING = 0, 1, 2
+STATE_NAMES = ('still', 'stop', 'moving')
+
+# Key giữ đúng thứ tự dict của bản cũ
+BASIC_STATE_KEYS = ('still_duration', 'moving_duration', 'stop_duration', 'state_transitions', 'dominant_state_numeric')
+
+
+def frame_motion(keypoints):
+    """Motion của từng frame so với frame trước: (N, 17, 2) -> (N-1,)
+
+    Trung bình |Δ| trên các tọa độ hợp lệ ở cả hai frame, 0 nếu không có tọa độ nào.
+    """
+
+    coords = np.asarray(keypoints, dtype=np.float64).reshape(len(keypoints), -1)
+    delta = np.abs(np.diff(coords, axis=0))
+    valid = ~np.isnan(delta)
+
+    n_valid = valid.sum(axis=1)
+    total = np.where(valid, delta, 0).sum(axis=1)
+    return np.where(n_valid > 0, total / np.maximum(n_valid, 1), 0.0)
+
+
+def classify_states(motion_windows):
+    """Trạng thái từng frame của mọi window: (W, M) motion -> (W, M) mã trạng thái"""
+
+    mean = motion_windows.mean(axis=1, keepdims=True)
+    std = motion_windows.std(axis=1, keepdims=True)
+    still_threshold = mean - 0.5 * std
+    moving_threshold = mean + 0.5 * std
+
+    # Thứ tự ưu tiên giống bản cũ: still trước, rồi moving, còn lại là stop
+    states = np.full(motion_windows.shape, STATE_STOP, dtype=np.int8)
+    states[motion_windows >= moving_threshold] = STATE_MOVING
+    states[motion_windows <= still_threshold] = STATE_STILL
+    return states
+
+
+def motion_state_features(motion_windows):
+    """Đặc trưng 3 trạng thái cho mọi window: motion (W, M) -> dict tên -> mảng (W,)"""
+
+    motion_windows = np.asarray(motion_windows, dtype=np.float64)
+    n_windows, n_motions = motion_windows.shape
+
+    if n_motions == 0:
+        # Window 1 frame: không có motion, giữ giá trị mặc định
+        return {key: np.zeros(n_windows, dtype=np.int64) for key in BASIC_STATE_KEYS}
+
+    states = classify_states(motion_windows)
+    counts = np.stack([(states == code).sum(axis=1) for code in range(len(STATE_NAMES))], axis=1)
+
+    # Trạng thái chính: nhiều frame nhất, hoà thì trạng thái xuất hiện trước (như value_counts)
+    present = states[:, :, np.newaxis] == np.arange(len(STATE_NAMES))
+    first_seen = np.where(present.any(axis=1), present.argmax(axis=1), n_motions)
+    dominant = (counts * (n_motions + 1) + (n_motions - first_seen)).argmax(axis=1)
+
+    # Ranh giới giữa các run trạng thái = số lần chuyển trạng thái
+    transitions = (states[:, 1:] != states[:, :-1]).sum(axis=1)
+
+    features = {
+        'still_duration': counts[:, STATE_STILL] / n_motions,
+        'moving_duration': counts[:, STATE_MOVING] / n_motions,
+        'stop_duration': counts[:, STATE_STOP] / n_motions,
+        'state_transitions': transitions / n_motions,
+        'dominant_state_numeric': dominant.astype(np.int64),
+        'motion_variance': motion_windows.var(axis=1),
+        'motion_range': motion_windows.max(axis=1) - motion_windows.min(axis=1),
+    }
+    if n_motions > 1:
+        features['motion_smoothness'] = -np.diff(motion_windows, axis=1).std(axis=1)
+    else:
+        features['motion_smoothness'] = np.zeros(n_windows)
+    return features
+
+
+def subject_motion_states(keypoints, window_size, step, motion=None):
+    """Đặc trưng 3 trạng thái cho tất cả window của một subject
+
+    Motion từng frame tính một lần (hoặc truyền vào motion đã tính sẵn); window bắt đầu
+    tại s dùng motion[s : s + window_size - 1] (view, không copy), cùng thứ tự với
+    window_builder.window_starts.
+    """
+
+    if motion is None:
+        motion = frame_motion(keypoints)
+    if window_size < 2:
+        n_windows = len(window_starts(len(keypoints), window_size, step))
+        return motion_state_features(np.empty((n_windows, 0)))
+    return motion_state_features(sliding_windows(motion, window_size - 1, step))
+
+
+def window_motion_states(motion, starts, window_size):
+    """Đặc trưng 3 trạng thái cho các window bắt đầu tại starts (không cần cách đều)
+
+    motion là motion từng frame đã tính sẵn; window tại s dùng motion[s : s + window_size - 1].
+    """
+
+    starts = np.asarray(starts, dtype=np.int64)
+    if window_size < 2:
+        return motion_state_features(np.empty((len(starts), 0)))
+    return motion_state_features(motion[starts[:, np.newaxis] + np.arange(window_size - 1)])
+
+
+def state_records(features, prefix='state_'):
+    """dict tên -> mảng (W,) -> list W dict {prefix + tên: giá trị}"""
+    names = list(features)
+    return [
+        {f'{prefix}{name}': features[name][idx].item() for name in names}
+        for idx in range(len(features[names[0]]) if names else 0)
+    ]
@@ -0,0 +1,110 @@
+"""
+ISAS Challenge 2025 - Parallel Features
+Trích xuất đặc trưng theo window song song trên nhiều process
+
+Tính năng:
+- Chia việc theo subject; subject dài được chia tiếp thành các shard gồm các window liên tiếp
+- Keypoints của mỗi subject ghi một lần ra file .npy, worker mở bằng memmap (không pickle frame)
+- Worker dựng FramePrimitives chỉ trên đoạn frame của shard rồi gọi hàm trích xuất
+  (mọi đặc trưng window chỉ dùng frame trong window nên kết quả giống hệt chạy trên cả subject)
+- Ghép kết quả theo thứ tự subject / window cố định, không theo thứ tự hoàn thành
+- Shard lỗi được chạy lại tuần tự trong process chính
+"""
+
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from frame_primitives import FramePrimitives
+
+# Số window tối đa trong một shard (đủ lớn để chi phí dựng primitives của shard không đáng kể)
+DEFAULT_SHARD_WINDOWS = 64
+
+
+def plan_shards(subject_starts, window_size, shard_windows=DEFAULT_SHARD_WINDOWS):
+    """Danh sách shard (subject, slice vào subject_starts[subject], frame bắt đầu, frame kết thúc)"""
+
+    shards = []
+    for subject, starts in subject_starts.items():
+        for first in range(0, len(starts), shard_windows):
+            last = min(first + shard_windows, len(starts))
+            frame_start = int(min(starts[first:last]))
+            frame_end = int(max(starts[first:last])) + window_size
+            shards.append((subject, slice(first, last), frame_start, frame_end))
+    return shards
+
+
+def _extract_shard(keypoints_source, frame_start, frame_end, starts, window_size, extract_fn, coordinate_order):
+    """Worker: trích xuất các window của một shard (keypoints_source là mảng hoặc file .npy)"""
+
+    if isinstance(keypoints_source, str):
+        keypoints_source = np.load(keypoints_source, mmap_mode='r')
+    primitives = FramePrimitives(keypoints_source[frame_start:frame_end], coordinate_order)
+    return extract_fn(primitives, [start - frame_start for start in starts], window_size)
+
+
+def _fork_context():
+    """Context 'fork' nếu có: worker kế thừa hàm/đối tượng định nghĩa trong notebook (__main__)"""
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def extract_windows(subject_keypoints, subject_starts, window_size, extract_fn, coordinate_order=None,
+                    workers=1, shard_windows=DEFAULT_SHARD_WINDOWS, verbose=True):
+    """Chạy extract_fn trên các window của mọi subject, song song theo shard
+
+    subject_keypoints: {subject: keypoints (N, 17, 2)}; subject_starts: {subject: frame bắt đầu các window}.
+    extract_fn(primitives, starts, window_size) -> list kết quả từng window (starts tính theo primitives).
+    Trả về {subject: list kết quả theo đúng thứ tự subject_starts[subject]}.
+    """
+
+    shards = plan_shards(subject_starts, window_size, shard_windows)
+    results = {subject: [None] * len(starts) for subject, starts in subject_starts.items()}
+    workers = min(workers or os.cpu_count() or 1, len(shards)) or 1
+
+    pending = shards
+    if workers > 1 and _fork_context() is None:
+        if verbose:
+            print("⚠️ Nền tảng không hỗ trợ fork - trích xuất đặc trưng tuần tự")
+        workers = 1
+
+    if workers > 1:
+        if verbose:
+            print(f"⚡ Trích xuất song song {len(shards)} shards ({len(subject_starts)} subjects) với {workers} workers...")
+
+        pending = []
+        with tempfile.TemporaryDirectory(prefix='isas_features_') as tmp_dir:
+            # Mỗi subject ghi ra .npy một lần; worker chỉ đọc (memmap) đoạn frame của shard
+            sources = {}
+            for idx, subject in enumerate(subject_starts):
+                path = os.path.join(tmp_dir, f"subject_{idx}.npy")
+                np.save(path, np.asarray(subject_keypoints[subject], dtype=np.float64))
+                sources[subject] = path
+
+            with ProcessPoolExecutor(max_workers=workers, mp_context=_fork_context()) as executor:
+                futures = [(shard, executor.submit(_extract_shard, sources[shard[0]], shard[2], shard[3],
+                                                   subject_starts[shard[0]][shard[1]], window_size,
+                                                   extract_fn, coordinate_order))
+                           for shard in shards]
+
+                # Ghép kết quả theo thứ tự cố định (không theo thứ tự hoàn thành)
+                for shard, future in futures:
+                    subject, window_slice = shard[0], shard[1]
+                    try:
+                        results[subject][window_slice] = future.result()
+                    except Exception as e:
+                        if verbose:
+                            print(f"❌ Subject {subject} (frame {shard[2]}-{shard[3]}): "
+                                  f"Lỗi khi trích xuất song song ({e}) - sẽ chạy lại tuần tự")
+                        pending.append(shard)
+
+    for subject, window_slice, frame_start, frame_end in pending:
+        results[subject][window_slice] = _extract_shard(subject_keypoints[subject], frame_start, frame_end,
+                                                        subject_starts[subject][window_slice], window_size,
+                                                        extract_fn, coordinate_order)
+
+    return results
@@ -0,0 +1,143 @@
+"""
+ISAS Challenge 2025 - Recording Statistics
+Thống kê keypoint/label tích luỹ trong một lần duyệt recording
+
+Tính năng:
+- Cập nhật theo từng block frame (RAM không phụ thuộc độ dài recording)
+- Số frame theo nhãn, số giá trị missing, min/max tọa độ x/y
+- Movement trung bình của nose (nối tiếp giữa các block)
+- Cache kết quả theo checksum nội dung file (user không đổi không cần duyệt lại)
+"""
+
+import os
+import pickle
+
+import numpy as np
+
+from keypoint_store import DEFAULT_BLOCK_SIZE
+
+STATS_CACHE_VERSION = 1
+
+
+class RecordingStatsAccumulator:
+    """Bộ tích luỹ thống kê cho một recording"""
+
+    def __init__(self, n_labels=0):
+        self.n_frames = 0
+        self.label_counts = np.zeros(n_labels, dtype=np.int64)
+        self.missing_count = 0
+        self.total_values = 0
+
+        # Min/max tọa độ (None = chưa có giá trị hợp lệ)
+        self.x_min = self.x_max = None
+        self.y_min = self.y_max = None
+
+        # Movement của nose: giá trị hợp lệ cuối cùng, tổng |diff| và số diff (x, y)
+        self.nose_last = [None, None]
+        self.nose_abs_diff = [0.0, 0.0]
+        self.nose_diff_count = [0, 0]
+
+    def update(self, keypoints, label_codes=None):
+        """Cập nhật với một block keypoints (n, 17, 2) và mã nhãn (n,)"""
+
+        self.n_frames += len(keypoints)
+        self.total_values += keypoints.size
+
+        # Số frame theo nhãn (mã -1 = không có nhãn)
+        if label_codes is not None and len(self.label_counts) > 0:
+            valid_codes = label_codes[label_codes >= 0]
+            self.label_counts += np.bincount(valid_codes, minlength=len(self.label_counts))
+
+        # Missing values (NaN)
+        self.missing_count += int(np.count_nonzero(np.isnan(keypoints)))
+
+        if len(keypoints) == 0:
+            return
+
+        # Min/max bỏ qua NaN, không tạo mảng tạm đã lọc
+        self.x_min, self.x_max = self._merge_range(self.x_min, self.x_max, keypoints[:, :, 0])
+        self.y_min, self.y_max = self._merge_range(self.y_min, self.y_max, keypoints[:, :, 1])
+
+        # Movement của nose, nối tiếp với block trước
+        for axis in (0, 1):
+            nose = keypoints[:, 0, axis]
+            nose = nose[~np.isnan(nose)].astype(np.float64)
+            if len(nose) == 0:
+                continue
+            if self.nose_last[axis] is not None:
+                nose = np.concatenate(([self.nose_last[axis]], nose))
+            self.nose_abs_diff[axis] += np.abs(np.diff(nose)).sum()
+            self.nose_diff_count[axis] += len(nose) - 1
+            self.nose_last[axis] = nose[-1]
+
+    @staticmethod
+    def _merge_range(current_min, current_max, values):
+        block_min = np.fmin.reduce(values, axis=None)
+        if np.isnan(block_min):
+            return current_min, current_max
+        block_max = np.fmax.reduce(values, axis=None)
+        if current_min is None:
+            return block_min, block_max
+        return min(current_min, block_min), max(current_max, block_max)
+
+    @property
+    def missing_percentage(self):
+        return (self.missing_count / self.total_values * 100) if self.total_values > 0 else 0
+
+    @property
+    def movement(self):
+        """Movement trung bình (pixels/frame) của nose theo x, y"""
+        movement_x = movement_y = 0
+        if self.nose_diff_count[0] > 0:
+            movement_x = self.nose_abs_diff[0] / self.nose_diff_count[0]
+            movement_y = self.nose_abs_diff[1] / self.nose_diff_count[1] if self.nose_diff_count[1] > 0 else np.nan
+        return movement_x, movement_y
+
+
+def scan_recording(recording, block_size=DEFAULT_BLOCK_SIZE):
+    """Duyệt recording một lần, trả về RecordingStatsAccumulator"""
+
+    stats = RecordingStatsAccumulator(n_labels=len(recording.label_names))
+    for _, keypoints, _, label_codes in recording.iter_blocks(block_size):
+        stats.update(keypoints, label_codes)
+    return stats
+
+
+class RecordingStatsCache:
+    """Cache RecordingStatsAccumulator trên đĩa, key = checksum nội dung recording"""
+
+    def __init__(self, cache_dir, verbose=True):
+        self.cache_dir = cache_dir
+        self.verbose = verbose
+
+    def _path(self, checksum):
+        return os.path.join(self.cache_dir, f"{checksum}.pkl")
+
+    def get(self, checksum):
+        """Thống kê đã lưu (None nếu chưa có hoặc khác version)"""
+
+        path = self._path(checksum)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                payload = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        if payload.get('version') != STATS_CACHE_VERSION:
+            return None
+        return payload['stats']
+
+    def put(self, checksum, stats):
+        """Lưu thống kê (ghi file tạm rồi rename, an toàn khi chạy nhiều process)"""
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(checksum)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'version': STATS_CACHE_VERSION, 'stats': stats}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            if self.verbose:
+                print(f"⚠️ Không ghi được cache thống kê {path}: {e}")
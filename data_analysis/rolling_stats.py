@@ -0,0 +1,172 @@
+"""
+ISAS Challenge 2025 - Rolling Stats
+Thống kê trên các khoảng frame [start, end) bằng prefix sum và sparse table
+
+Tính năng:
+- count / sum / mean / std qua tổng cộng dồn (tổng và tổng bình phương): O(1) mỗi window
+- min / max qua sparse table: O(1) mỗi window sau khi dựng bảng một lần
+- Khoảng độ dài bất kỳ: cùng một bảng dùng được cho mọi window_size / step
+- Chuỗi được dịch theo trung bình và cộng dồn bằng long double để giảm sai số làm tròn của std
+- Tiện ích frame hợp lệ trước / sau và hiệu giữa các frame hợp lệ liên tiếp
+"""
+
+import numpy as np
+
+
+def _frame_index(valid):
+    """Chỉ số frame broadcast theo shape của valid (trục 0 là frame)"""
+    return np.arange(len(valid)).reshape((len(valid),) + (1,) * (np.ndim(valid) - 1))
+
+
+def previous_valid_index(valid):
+    """Với mỗi frame: index frame hợp lệ gần nhất trước nó (-1 nếu không có), theo từng cột"""
+
+    valid = np.asarray(valid, dtype=bool)
+    last_valid = np.maximum.accumulate(np.where(valid, _frame_index(valid), -1), axis=0)
+
+    previous = np.full(valid.shape, -1, dtype=np.int64)
+    previous[1:] = last_valid[:-1]
+    return previous
+
+
+def next_valid_index(valid):
+    """(N + 1, ...): index frame hợp lệ đầu tiên >= i (N nếu không có), dòng cuối = N"""
+
+    valid = np.asarray(valid, dtype=bool)
+    n_frames = len(valid)
+    index = np.where(valid, _frame_index(valid), n_frames)
+
+    result = np.full((n_frames + 1,) + valid.shape[1:], n_frames, dtype=np.int64)
+    result[:-1] = np.minimum.accumulate(index[::-1], axis=0)[::-1]
+    return result
+
+
+def valid_differences(values, valid):
+    """Hiệu giữa mỗi frame hợp lệ và frame hợp lệ trước nó
+
+    valid có shape (N,) (dùng chung cho mọi cột của values). Trả về (hiệu, mask frame có hiệu).
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    previous = previous_valid_index(valid)
+    has_previous = np.asarray(valid, dtype=bool) & (previous >= 0)
+    return values - values[np.maximum(previous, 0)], has_previous
+
+
+def prefix_sums(values):
+    """Tổng cộng dồn theo trục frame, thêm dòng 0 ở đầu: (N + 1, ...)"""
+    values = np.asarray(values)
+    zeros = np.zeros((1,) + values.shape[1:], dtype=values.dtype)
+    return np.concatenate([zeros, np.cumsum(values, axis=0)])
+
+
+def range_sums(prefix, starts, ends):
+    """Tổng của các khoảng [start, end) từ prefix_sums"""
+    return prefix[ends] - prefix[starts]
+
+
+class SparseTable:
+    """Sparse table cho min hoặc max trên khoảng: dựng O(N log L), truy vấn O(1)"""
+
+    def __init__(self, values, op, max_length=None):
+        self.op = op
+        self.levels = [np.asarray(values)]
+
+        # Chỉ dựng các tầng cần cho khoảng dài nhất sẽ truy vấn
+        limit = len(values) if max_length is None else min(len(values), max_length)
+        width = 1
+        while 2 * width <= limit:
+            level = self.levels[-1]
+            self.levels.append(op(level[:-width], level[width:]))
+            width *= 2
+
+    def query(self, starts, ends, empty):
+        """op trên values[start:end] của mọi khoảng; khoảng rỗng nhận giá trị empty"""
+
+        starts = np.asarray(starts, dtype=np.int64)
+        lengths = np.asarray(ends, dtype=np.int64) - starts
+        result = np.full((len(starts),) + self.levels[0].shape[1:], empty, dtype=self.levels[0].dtype)
+
+        nonempty = lengths > 0
+        # frexp: length = m * 2^e với m thuộc [0.5, 1) -> floor(log2(length)) = e - 1 (chính xác)
+        level = np.zeros(len(starts), dtype=np.int64)
+        level[nonempty] = np.frexp(lengths[nonempty].astype(np.float64))[1] - 1
+        if nonempty.any() and level.max() >= len(self.levels):
+            raise ValueError(f"Khoảng dài {lengths.max()} vượt max_length của sparse table")
+
+        for j in np.unique(level[nonempty]):
+            selected = nonempty & (level == j)
+            table = self.levels[j]
+            result[selected] = self.op(table[starts[selected]], table[starts[selected] + lengths[selected] - (1 << j)])
+
+        return result
+
+
+class RollingStats:
+    """Thống kê các khoảng frame của values (N,) hoặc (N, K), chỉ tính các frame hợp lệ
+
+    valid (N,) áp dụng cho mọi cột; mặc định là frame không có NaN.
+    Khoảng không có frame hợp lệ -> NaN (giống window_features.masked_stats).
+    """
+
+    def __init__(self, values, valid=None, extrema=True, max_length=None):
+        values = np.asarray(values, dtype=np.float64)
+        if valid is None:
+            valid = ~np.isnan(values.reshape(len(values), -1)).any(axis=1)
+        valid = np.asarray(valid, dtype=bool)
+        mask = valid.reshape((len(valid),) + (1,) * (values.ndim - 1))
+
+        # Dịch theo trung bình và cộng dồn bằng long double (nếu nền tảng hỗ trợ)
+        # để hiệu tổng bình phương - bình phương trung bình không mất chữ số
+        n_valid = valid.sum()
+        self.shift = np.where(mask, values, 0).sum(axis=0) / max(n_valid, 1)
+        shifted = np.where(mask, values - self.shift, 0.0).astype(np.longdouble)
+
+        self._counts = prefix_sums(valid.astype(np.int64))
+        self._sums = prefix_sums(shifted)
+        self._squares = prefix_sums(shifted ** 2)
+        self._ndim = values.ndim
+
+        self._min_table = self._max_table = None
+        if extrema:
+            self._min_table = SparseTable(np.where(mask, values, np.inf), np.minimum, max_length)
+            self._max_table = SparseTable(np.where(mask, values, -np.inf), np.maximum, max_length)
+
+    def _broadcast(self, array):
+        return array.reshape((len(array),) + (1,) * (self._ndim - 1))
+
+    def count(self, starts, ends):
+        return range_sums(self._counts, starts, ends)
+
+    def sum(self, starts, ends):
+        counts = self._broadcast(self.count(starts, ends))
+        return (range_sums(self._sums, starts, ends) + self.shift * counts).astype(np.float64)
+
+    def moments(self, starts, ends):
+        """(count, mean, std) của mọi khoảng (std = độ lệch chuẩn tổng thể như np.std)"""
+
+        counts = self.count(starts, ends)
+        safe_counts = self._broadcast(np.maximum(counts, 1))
+        shifted_mean = range_sums(self._sums, starts, ends) / safe_counts
+        variance = range_sums(self._squares, starts, ends) / safe_counts - shifted_mean ** 2
+        variance = np.where(self._broadcast(counts > 1), np.maximum(variance, 0.0), 0.0)
+        if self._min_table is not None:
+            # Khoảng hằng (min == max): std = 0 chính xác, không để lại sai số làm tròn
+            minimum, maximum = self.extrema(starts, ends)
+            variance = np.where(minimum == maximum, 0.0, variance)
+
+        empty = self._broadcast(counts == 0)
+        mean = np.where(empty, np.nan, (shifted_mean + self.shift).astype(np.float64))
+        std = np.where(empty, np.nan, np.sqrt(variance).astype(np.float64))
+        return counts, mean, std
+
+    def extrema(self, starts, ends):
+        """(min, max) của mọi khoảng"""
+
+        if self._min_table is None:
+            raise ValueError("RollingStats được tạo với extrema=False")
+
+        empty = self._broadcast(self.count(starts, ends) == 0)
+        minimum = self._min_table.query(starts, ends, np.inf)
+        maximum = self._max_table.query(starts, ends, -np.inf)
+        return np.where(empty, np.nan, minimum), np.where(empty, np.nan, maximum)
@@ -18,11 +18,210 @@ import pandas as pd
 import numpy as np
 import cv2
 import os
+import io
+import argparse
+import contextlib
+import shutil
+import subprocess
+import multiprocessing
+import time
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from collections import Counter
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+from keypoint_store import KeypointStore, resolve_keypoint_columns
+from dataset_manifest import DatasetManifest
+
+def point_norm(points):
+    """Độ dài vector (x, y) theo trục cuối: sqrt(x*x + y*y)
+    
+    Dùng chung cho normalize_skeleton và normalize_skeleton_batch: cùng phép tính từng phần tử
+    nên kết quả 1 frame và cả chuỗi giống nhau tới từng bit (np.linalg.norm thì không).
+    """
+    return np.sqrt(points[..., 0] * points[..., 0] + points[..., 1] * points[..., 1])
+
+class FrameCompositor:
+    """Ghép frame video: buffer dùng lại, layout tính một lần, cache overlay label"""
+    
+    def __init__(self, generator):
+        self.generator = generator
+        self.width = generator.video_width
+        self.height = generator.video_height
+        
+        # Layout Picture-in-picture (original scale)
+        self.pip_width = int(self.width * generator.pip_size)
+        self.pip_height = int(self.height * generator.pip_size)
+        self.pip_x = self.width - self.pip_width - 20  # 20px margin từ bên phải
+        self.pip_y = self.height - self.pip_height - 20  # 20px margin từ dưới
+        self.pip_center = np.array([self.pip_width/2, self.pip_height/2])
+        
+        # Buffer frame chính + PiP, dùng lại cho mọi frame
+        self.frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        self.pip_frame = np.zeros((self.pip_height, self.pip_width, 3), dtype=np.uint8)
+        
+        # label -> toạ độ pixel của text "Activity: ..." đã rasterize
+        self.label_overlays = {}
+    
+    def fit_to_pip(self, keypoints):
+        """Scale keypoints gốc để fit trong PiP"""
+        
+        original_keypoints = keypoints.copy()
+        valid = np.linalg.norm(original_keypoints, axis=1) > 0
+        if not valid.any():
+            return original_keypoints
+        
+        # Find bounding box
+        valid_points = original_keypoints[valid]
+        min_x, min_y = valid_points.min(axis=0)
+        max_x, max_y = valid_points.max(axis=0)
+        
+        # Scale để fit trong PiP
+        scale_x = self.pip_width / (max_x - min_x) if (max_x - min_x) > 0 else 1
+        scale_y = self.pip_height / (max_y - min_y) if (max_y - min_y) > 0 else 1
+        scale = min(scale_x, scale_y) * 0.8  # 80% để có margin
+        
+        # Center trong PiP
+        original_keypoints = (original_keypoints - [min_x, min_y]) * scale
+        scaled_valid = np.linalg.norm(original_keypoints, axis=1) > 0
+        current_center = np.mean(original_keypoints[scaled_valid], axis=0) if scaled_valid.any() else np.array([0, 0])
+        
+        return original_keypoints - current_center + self.pip_center
+    
+    def compose(self, frame_idx, normalized_keypoints, original_keypoints):
+        """Vẽ skeleton, PiP và thông tin frame vào buffer, trả về frame"""
+        
+        frame = self.frame
+        frame.fill(0)
+        
+        # Vẽ skeleton lên frame
+        self.generator.draw_skeleton_on_frame(frame, normalized_keypoints)
+        
+        # Vẽ skeleton lên PiP rồi ghép vào frame chính
+        self.pip_frame.fill(0)
+        self.generator.draw_skeleton_on_frame(self.pip_frame, self.fit_to_pip(original_keypoints), alpha=0.8, linewidth=1)
+        frame[self.pip_y:self.pip_y+self.pip_height, self.pip_x:self.pip_x+self.pip_width] = self.pip_frame
+        
+        # Add frame info
+        timestamp = frame_idx / self.generator.fps
+        cv2.putText(frame, f"Frame: {frame_idx}", (self.width - 200, 50), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        cv2.putText(frame, f"Time: {timestamp:.2f}s", (self.width - 200, 70), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        
+        return frame
+    
+    def add_label(self, frame, action_label):
+        """Thêm text activity label (rasterize một lần cho mỗi label)"""
+        
+        text = f"Activity: {action_label}"
+        overlay = self.label_overlays.get(action_label)
+        if overlay is None:
+            # Render text lên nền đen, giữ lại vùng bao quanh chữ
+            canvas = np.zeros_like(self.frame)
+            cv2.putText(canvas, text, (50, 50), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            ys, xs = np.nonzero(canvas.any(axis=2))
+            y0, y1, x0, x1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+            overlay = (y0, y1, x0, x1, canvas[y0:y1, x0:x1].copy())
+            self.label_overlays[action_label] = overlay
+        
+        y0, y1, x0, x1, patch = overlay
+        region = frame[y0:y1, x0:x1]
+        if region.any():
+            # Có nét vẽ dưới chữ -> để putText blend như cũ
+            cv2.putText(frame, text, (50, 50), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        else:
+            region[...] = patch
+        return frame
+
+class BackgroundVideoWriter:
+    """Ghi video trên thread riêng để encode chạy song song với việc vẽ
+    
+    Frame được copy vào một pool buffer cố định (queue_size buffer); khi pool
+    hết, write() chờ encoder (back-pressure). Backend 'opencv' dùng
+    cv2.VideoWriter (mp4v), 'ffmpeg' pipe raw BGR frames sang process ffmpeg.
+    """
+    
+    def __init__(self, output_file, fps, frame_size, backend='opencv', queue_size=8):
+        self.output_file = output_file
+        self.backend = backend
+        self.error = None
+        
+        width, height = frame_size
+        if backend == 'ffmpeg':
+            self.process = subprocess.Popen(
+                ['ffmpeg', '-y', '-loglevel', 'error',
+                 '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f"{width}x{height}", '-r', str(fps), '-i', '-',
+                 '-c:v', 'libx264', '-pix_fmt', 'yuv420p', output_file],
+                stdin=subprocess.PIPE)
+            self.video_writer = None
+        else:
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            self.video_writer = cv2.VideoWriter(output_file, fourcc, fps, frame_size)
+            self.process = None
+        
+        # Pool buffer dùng lại: free -> (write) -> pending -> (encode) -> free
+        self.free_buffers = queue.Queue()
+        for _ in range(queue_size):
+            self.free_buffers.put(np.empty((height, width, 3), dtype=np.uint8))
+        self.pending = queue.Queue()
+        
+        self.thread = threading.Thread(target=self._encode_loop, name=f"encoder-{os.path.basename(output_file)}", daemon=True)
+        self.thread.start()
+    
+    def _encode_loop(self):
+        while True:
+            buffer = self.pending.get()
+            if buffer is None:
+                break
+            
+            # Sau khi lỗi vẫn tiếp tục trả buffer để producer không bị treo
+            if self.error is None:
+                try:
+                    if self.process is not None:
+                        self.process.stdin.write(buffer.data)
+                    else:
+                        self.video_writer.write(buffer)
+                except Exception as e:
+                    self.error = e
+            
+            self.free_buffers.put(buffer)
+    
+    def write(self, frame):
+        """Đưa frame vào hàng đợi encode (chờ nếu encoder chưa theo kịp)"""
+        
+        if self.error is not None:
+            raise RuntimeError(f"Lỗi encoder {self.output_file}: {self.error}") from self.error
+        
+        buffer = self.free_buffers.get()
+        np.copyto(buffer, frame)
+        self.pending.put(buffer)
+    
+    def release(self):
+        """Đợi encode hết các frame còn lại rồi đóng file"""
+        
+        self.pending.put(None)
+        self.thread.join()
+        
+        if self.process is not None:
+            try:
+                self.process.stdin.close()
+            except OSError as e:
+                self.error = self.error or e
+            if self.process.wait() != 0 and self.error is None:
+                self.error = RuntimeError(f"ffmpeg thoát với mã {self.process.returncode}")
+        else:
+            self.video_writer.release()
+        
+        if self.error is not None:
+            raise RuntimeError(f"Lỗi encoder {self.output_file}: {self.error}") from self.error
+
+
 class SkeletonVideoGenerator:
     """Lớp tạo video skeleton animation"""
     
@@ -96,57 +295,78 @@ class SkeletonVideoGenerator:
         self.video_height = 720
         self.fps = 30
         self.pip_size = 0.25  # Picture-in-picture size (25% of main)
+        self.scale_smoothing = None  # Số frame làm mượt scale factor (None = tắt)
+        self.encoder = 'opencv'  # 'opencv' (cv2.VideoWriter mp4v) hoặc 'ffmpeg' (pipe raw frames)
+        self.encoder_queue_size = 8  # Số frame tối đa chờ encode
+        self.block_size = 10_000  # Số frame decode/normalize mỗi block (RAM không phụ thuộc độ dài video)
         
-    def load_keypoint_data(self, user_id, with_labels=False):
-        """Load keypoint data cho user cụ thể"""
+        # Cache dạng cột cho keypoint CSV
+        self.keypoint_store = KeypointStore()
         
-        if with_labels:
-            file_path = f"../Train_Data/keypointlabel/keypoints_with_labels_{user_id}.csv"
-        else:
-            file_path = f"../Train_Data/keypoint/video_{user_id}.csv"
-            
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File không tồn tại: {file_path}")
-            
-        df = pd.read_csv(file_path)
-        print(f"✅ Loaded {len(df)} frames từ {file_path}")
+        # Subjects và file dữ liệu được tìm tự động trong Train_Data (index cache)
+        self.manifest = DatasetManifest('../Train_Data', keypoint_store=self.keypoint_store)
+        
+        # Màu BGR, nhóm cạnh theo màu, mẫu chấm keypoint - tính sẵn một lần
+        self.build_render_plan()
         
-        return df
+    def get_keypoint_file_path(self, user_id, with_labels=False):
+        """Đường dẫn file keypoint CSV của user"""
+        
+        return self.manifest.file_path(user_id, 'label' if with_labels else 'keypoint')
     
-    def extract_keypoints_from_row(self, row):
-        """Trích xuất keypoints từ một row DataFrame"""
+    def get_output_file_path(self, user_id, with_labels=False):
+        """Đường dẫn file video output của user"""
         
-        keypoints = np.zeros((17, 2))  # 17 keypoints, 2 coordinates (x, y)
+        output_dir = "../output/videos"
+        os.makedirs(output_dir, exist_ok=True)
         
-        # Mapping tên cột với keypoint indices
-        keypoint_mapping = {
-            'nose': 0, 'left_eye': 1, 'right_eye': 2, 'left_ear': 3, 'right_ear': 4,
-            'left_shoulder': 5, 'right_shoulder': 6, 'left_elbow': 7, 'right_elbow': 8,
-            'left_wrist': 9, 'right_wrist': 10, 'left_hip': 11, 'right_hip': 12,
-            'left_knee': 13, 'right_knee': 14, 'left_ankle': 15, 'right_ankle': 16
-        }
+        label_suffix = "_with_labels" if with_labels else "_skeleton_only"
+        return f"{output_dir}/user_{user_id}{label_suffix}.mp4"
+    
+    def load_keypoint_recording(self, user_id, with_labels=False):
+        """Load recording (memory-map từ cache .npy) cho user cụ thể"""
         
-        # Tìm và map keypoints
-        for kp_name, kp_idx in keypoint_mapping.items():
-            x_col = None
-            y_col = None
+        file_path = self.get_keypoint_file_path(user_id, with_labels)
             
-            # Tìm cột x và y cho keypoint này
-            for col in row.index:
-                col_lower = col.lower()
-                if kp_name in col_lower and '_x' in col_lower:
-                    x_col = col
-                elif kp_name in col_lower and '_y' in col_lower:
-                    y_col = col
-            
-            # Lấy giá trị x, y
-            if x_col is not None and y_col is not None:
-                x_val = row[x_col] if not pd.isna(row[x_col]) else 0
-                y_val = row[y_col] if not pd.isna(row[y_col]) else 0
-                keypoints[kp_idx] = [x_val, y_val]
+        # Đọc từ cache .npy (tự build lại khi CSV thay đổi)
+        recording = self.keypoint_store.load(file_path)
+        print(f"✅ Loaded {len(recording)} frames từ {file_path}")
+        
+        return recording
+    
+    def load_keypoint_data(self, user_id, with_labels=False):
+        """Load keypoint data cho user cụ thể"""
+        
+        return self.load_keypoint_recording(user_id, with_labels).to_dataframe()
+    
+    def extract_keypoints_array(self, df):
+        """Chuyển toàn bộ DataFrame sang mảng keypoints (N, 17, 2) trong một lần"""
+        
+        keypoints = np.zeros((len(df), 17, 2))  # N frames, 17 keypoints, 2 coordinates (x, y)
+        
+        # Mapping cột -> keypoint chỉ tính một lần cho mỗi file
+        for kp_idx, cols in enumerate(resolve_keypoint_columns(df.columns)):
+            if cols is not None:
+                keypoints[:, kp_idx, :] = df[list(cols)].to_numpy(dtype=np.float64)
+        
+        # NaN -> 0 (keypoint bị missing)
+        keypoints[np.isnan(keypoints)] = 0
+        
+        return keypoints
+    
+    def extract_keypoints_block(self, keypoints_block):
+        """Copy một block keypoints (memory-map) sang float64, NaN -> 0"""
+        
+        keypoints = np.array(keypoints_block, dtype=np.float64)
+        keypoints[np.isnan(keypoints)] = 0
         
         return keypoints
     
+    def extract_keypoints_from_row(self, row):
+        """Trích xuất keypoints từ một row DataFrame"""
+        
+        return self.extract_keypoints_array(row.to_frame().T)[0]
+    
     def normalize_skeleton(self, keypoints):
         """Normalize skeleton để giữ tỷ lệ ổn định"""
         
@@ -157,25 +377,25 @@ class SkeletonVideoGenerator:
         right_hip = keypoints[12]
         
         # Tính center point
-        if not (np.linalg.norm(left_shoulder) == 0 and np.linalg.norm(right_shoulder) == 0):
+        if not (point_norm(left_shoulder) == 0 and point_norm(right_shoulder) == 0):
             center = (left_shoulder + right_shoulder) / 2
-        elif not (np.linalg.norm(left_hip) == 0 and np.linalg.norm(right_hip) == 0):
+        elif not (point_norm(left_hip) == 0 and point_norm(right_hip) == 0):
             center = (left_hip + right_hip) / 2
         else:
-            valid_keypoints = keypoints[np.linalg.norm(keypoints, axis=1) > 0]
+            valid_keypoints = keypoints[point_norm(keypoints) > 0]
             center = np.mean(valid_keypoints, axis=0) if len(valid_keypoints) > 0 else np.array([self.video_width//2, self.video_height//2])
         
         # Tính scale dựa trên shoulder width hoặc body height
-        shoulder_width = np.linalg.norm(right_shoulder - left_shoulder) if not (np.linalg.norm(left_shoulder) == 0 and np.linalg.norm(right_shoulder) == 0) else 100
+        shoulder_width = point_norm(right_shoulder - left_shoulder) if not (point_norm(left_shoulder) == 0 and point_norm(right_shoulder) == 0) else 100
         
         # Tính body height (từ nose đến ankle trung bình)
         nose = keypoints[0]
         left_ankle = keypoints[15]
         right_ankle = keypoints[16]
         
-        if not np.linalg.norm(nose) == 0 and not (np.linalg.norm(left_ankle) == 0 and np.linalg.norm(right_ankle) == 0):
-            ankle_center = (left_ankle + right_ankle) / 2 if not np.linalg.norm(left_ankle) == 0 and not np.linalg.norm(right_ankle) == 0 else left_ankle if not np.linalg.norm(left_ankle) == 0 else right_ankle
-            body_height = np.linalg.norm(nose - ankle_center)
+        if not point_norm(nose) == 0 and not (point_norm(left_ankle) == 0 and point_norm(right_ankle) == 0):
+            ankle_center = (left_ankle + right_ankle) / 2 if not point_norm(left_ankle) == 0 and not point_norm(right_ankle) == 0 else left_ankle if not point_norm(left_ankle) == 0 else right_ankle
+            body_height = point_norm(nose - ankle_center)
         else:
             body_height = shoulder_width * 4  # Estimate
         
@@ -203,6 +423,76 @@ class SkeletonVideoGenerator:
         
         return normalized_keypoints
     
+    def normalize_skeleton_batch(self, keypoints_seq, scale_smoothing=None):
+        """Normalize toàn bộ chuỗi (N, 17, 2) một lần
+        
+        Không làm mượt scale thì kết quả giống hệt normalize_skeleton từng frame (tới từng bit);
+        kiểm tra bằng check_normalization / --check-normalization.
+        """
+        
+        keypoints_seq = np.asarray(keypoints_seq, dtype=np.float64)
+        n_frames = len(keypoints_seq)
+        
+        # Mask keypoint có dữ liệu (norm > 0)
+        present = point_norm(keypoints_seq) > 0
+        
+        left_shoulder, right_shoulder = keypoints_seq[:, 5], keypoints_seq[:, 6]
+        left_hip, right_hip = keypoints_seq[:, 11], keypoints_seq[:, 12]
+        nose = keypoints_seq[:, 0]
+        left_ankle, right_ankle = keypoints_seq[:, 15], keypoints_seq[:, 16]
+        
+        has_shoulders = present[:, 5] | present[:, 6]
+        has_hips = present[:, 11] | present[:, 12]
+        
+        # Center: shoulders -> hips -> trung bình các keypoint hợp lệ -> giữa màn hình
+        screen_center = np.array([self.video_width // 2, self.video_height // 2])
+        center = np.where(has_shoulders[:, None], (left_shoulder + right_shoulder) / 2,
+                          (left_hip + right_hip) / 2)
+        
+        fallback_frames = np.flatnonzero(~has_shoulders & ~has_hips)
+        for frame_idx in fallback_frames:
+            # Hiếm gặp: giữ np.mean như bản per-frame để kết quả khớp tuyệt đối
+            valid_keypoints = keypoints_seq[frame_idx][present[frame_idx]]
+            center[frame_idx] = np.mean(valid_keypoints, axis=0) if len(valid_keypoints) > 0 else screen_center
+        
+        # Scale reference
+        shoulder_delta = right_shoulder - left_shoulder
+        shoulder_width = np.where(has_shoulders, point_norm(shoulder_delta), 100)
+        
+        both_ankles = present[:, 15] & present[:, 16]
+        ankle_center = np.where(both_ankles[:, None], (left_ankle + right_ankle) / 2,
+                                np.where(present[:, 15][:, None], left_ankle, right_ankle))
+        has_height = present[:, 0] & (present[:, 15] | present[:, 16])
+        height_delta = nose - ankle_center
+        body_height = np.where(has_height, point_norm(height_delta), shoulder_width * 4)
+        
+        scale_reference = np.maximum(body_height, shoulder_width * 3)
+        scale_reference[scale_reference == 0] = 200  # Default scale
+        
+        # Scale to standard size (200 pixels height)
+        target_scale = 200
+        scale_factor = np.ones(n_frames)
+        np.divide(target_scale, scale_reference, out=scale_factor, where=scale_reference > 0)
+        
+        # Làm mượt scale theo thời gian để skeleton không bị giật
+        if scale_smoothing and scale_smoothing > 1:
+            scale_factor = self._smooth_scale_factors(scale_factor, int(scale_smoothing))
+        
+        return (keypoints_seq - center[:, None, :]) * scale_factor[:, None, None] + screen_center
+    
+    def _smooth_scale_factors(self, scale_factor, window):
+        """Moving average (centered) cho scale factor"""
+        
+        if len(scale_factor) == 0:
+            return scale_factor
+        
+        pad_left = window // 2
+        pad_right = window - 1 - pad_left
+        padded = np.pad(scale_factor, (pad_left, pad_right), mode='edge')
+        
+        cumsum = np.cumsum(np.insert(padded, 0, 0.0))
+        return (cumsum[window:] - cumsum[:-window]) / window
+    
     def draw_skeleton(self, ax, keypoints, color_scheme='body_parts', alpha=1.0, linewidth=2):
         """Vẽ skeleton lên axes"""
         
@@ -261,6 +551,42 @@ class SkeletonVideoGenerator:
             
             ax.scatter(point[0], point[1], c=color, s=30*alpha, alpha=alpha, zorder=10)
     
+    def build_render_plan(self):
+        """Chuẩn bị sẵn các primitive vẽ cho draw_skeleton_on_frame"""
+        
+        def hex_to_bgr(color_hex):
+            color_rgb = tuple(int(color_hex[i:i+2], 16) for i in (1, 3, 5))
+            return (color_rgb[2], color_rgb[1], color_rgb[0])  # RGB to BGR
+        
+        # Cạnh (E, 2) và màu BGR của từng cạnh
+        self.edge_index = np.array(self.skeleton_connections, dtype=np.intp)
+        edge_colors = [hex_to_bgr(self.body_colors.get(connection, '#FFFFFF')) for connection in self.skeleton_connections]
+        
+        # Gom cạnh cùng màu để vẽ bằng một lần cv2.polylines (giữ thứ tự xuất hiện)
+        self.edge_color_groups = []
+        for color_bgr in dict.fromkeys(edge_colors):
+            edge_ids = np.array([i for i, c in enumerate(edge_colors) if c == color_bgr], dtype=np.intp)
+            self.edge_color_groups.append((color_bgr, edge_ids))
+        
+        # Màu BGR của từng keypoint (17, 3)
+        joint_groups = [
+            ([0, 1, 2, 3, 4], '#FFD700'),   # face
+            ([5, 7, 9], '#00FF00'),         # left arm
+            ([6, 8, 10], '#0080FF'),        # right arm
+            ([11, 13, 15], '#FF00FF'),      # left leg
+            ([12, 14, 16], '#FF8000'),      # right leg
+        ]
+        self.joint_colors = np.full((len(self.keypoint_names), 3), 255, dtype=np.uint8)
+        for joint_ids, color_hex in joint_groups:
+            self.joint_colors[joint_ids] = hex_to_bgr(color_hex)
+        
+        # Mẫu pixel của chấm tròn bán kính 4 (giống hệt cv2.circle với tâm nguyên)
+        radius = 4
+        stamp = np.zeros((2 * radius + 1, 2 * radius + 1), dtype=np.uint8)
+        cv2.circle(stamp, (radius, radius), radius, 1, -1)
+        stamp_y, stamp_x = np.nonzero(stamp)
+        self.joint_stamp = (stamp_y - radius, stamp_x - radius)
+    
     def create_skeleton_video(self, user_id, with_labels=False, max_frames=None):
         """Tạo skeleton video cho user cụ thể"""
         
@@ -268,114 +594,202 @@ class SkeletonVideoGenerator:
         print("=" * 60)
         
         # Load data
-        df = self.load_keypoint_data(user_id, with_labels)
+        recording = self.load_keypoint_recording(user_id, with_labels)
+        n_frames = len(recording)
         
         # Limit frames nếu cần (để test)
-        if max_frames and len(df) > max_frames:
-            df = df.head(max_frames)
+        if max_frames and n_frames > max_frames:
+            n_frames = max_frames
             print(f"⚠️ Giới hạn {max_frames} frames để test")
         
         # Tạo output filename
-        output_dir = "../output/videos"
-        os.makedirs(output_dir, exist_ok=True)
-        
-        label_suffix = "_with_labels" if with_labels else "_skeleton_only"
-        output_file = f"{output_dir}/user_{user_id}{label_suffix}.mp4"
+        output_file = self.get_output_file_path(user_id, with_labels)
         
         print(f"🚀 Bắt đầu tạo video: {output_file}")
         
-        # Setup OpenCV VideoWriter
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        video_writer = cv2.VideoWriter(output_file, fourcc, self.fps, (self.video_width, self.video_height))
+        self.render_video_range(recording, [(output_file, with_labels)], max_frames=n_frames)
+        
+        print(f"\n✅ Video đã được tạo: {output_file}")
+        print(f"📊 Thông tin: {n_frames} frames, {n_frames/self.fps:.1f} giây, {self.fps} FPS")
+        
+        return output_file
+    
+    def keypoint_metadata_match(self, user_id):
+        """Lọc nhanh theo metadata trong manifest (số frame + cột keypoint), không parse / build cache
+        
+        Chỉ là điều kiện cần: cùng cột chưa chắc cùng toạ độ (export lại, làm mượt, điền NaN khác nhau).
+        """
+        
+        plain = self.manifest.get_entry(str(user_id), 'keypoint')
+        labeled = self.manifest.get_entry(str(user_id), 'label')
+        if plain is None or labeled is None:
+            return False
+        
+        return (plain['n_frames'] == labeled['n_frames']
+                and resolve_keypoint_columns(plain['columns']) == resolve_keypoint_columns(labeled['columns']))
+    
+    def can_share_keypoints(self, user_id):
+        """Kiểm tra 2 file CSV của user có cùng keypoints (để render 1 lần cho cả 2 video)
+        
+        Lọc theo metadata trước, sau đó so sánh toạ độ thật trên memory-map theo block (NaN == NaN).
+        """
+        
+        if not self.keypoint_metadata_match(user_id):
+            return False
+        
+        plain = self.keypoint_store.load(self.get_keypoint_file_path(user_id, with_labels=False))
+        labeled = self.keypoint_store.load(self.get_keypoint_file_path(user_id, with_labels=True))
+        if plain.keypoints.shape != labeled.keypoints.shape:
+            return False
+        
+        return all(np.array_equal(plain_block[1], labeled_block[1], equal_nan=True)
+                   for plain_block, labeled_block in zip(plain.iter_blocks(self.block_size),
+                                                         labeled.iter_blocks(self.block_size)))
+    
+    def create_user_videos(self, user_id, max_frames=None):
+        """Tạo cả 2 video (skeleton only + labels) của user trong một lần decode/vẽ"""
+        
+        print(f"\n🎬 Tạo skeleton video cho User {user_id} (không labels + có labels)")
+        print("=" * 60)
+        
+        # File có labels chứa đủ keypoints + Action Label cho cả 2 video
+        recording = self.load_keypoint_recording(user_id, with_labels=True)
+        n_frames = len(recording)
+        
+        # Limit frames nếu cần (để test)
+        if max_frames and n_frames > max_frames:
+            n_frames = max_frames
+            print(f"⚠️ Giới hạn {max_frames} frames để test")
+        
+        output_files = [self.get_output_file_path(user_id, with_labels=False),
+                        self.get_output_file_path(user_id, with_labels=True)]
+        
+        print(f"🚀 Bắt đầu tạo video: {', '.join(output_files)}")
+        
+        self.render_video_range(recording, [(output_files[0], False), (output_files[1], True)], max_frames=n_frames)
+        
+        for output_file in output_files:
+            print(f"\n✅ Video đã được tạo: {output_file}")
+        print(f"📊 Thông tin: {n_frames} frames, {n_frames/self.fps:.1f} giây, {self.fps} FPS")
+        
+        return output_files
+    
+    def render_video_range(self, recording, outputs, start=0, end=None, max_frames=None, progress_callback=None):
+        """Render các frame [start, end) của recording ra một hoặc nhiều file video
+        
+        outputs: list (output_file, with_labels). Skeleton được vẽ một lần mỗi frame,
+        label overlay chỉ thêm vào các video with_labels=True. Keypoints được đọc
+        theo block (self.block_size frames) từ memory-map nên RAM không tăng theo
+        độ dài recording; max_frames giới hạn độ dài chuỗi (như df.head).
+        """
+        
+        n_frames = len(recording) if not max_frames else min(max_frames, len(recording))
+        end = n_frames if end is None else min(end, n_frames)
+        
+        # Làm mượt scale factor cần các frame lân cận -> đọc thêm halo quanh mỗi block
+        halo = int(self.scale_smoothing) if self.scale_smoothing and self.scale_smoothing > 1 else 0
+        
+        # Setup video writer trên thread nền (video không labels ghi trước, overlay label vẽ sau)
+        encoder = self.encoder
+        if encoder == 'ffmpeg' and shutil.which('ffmpeg') is None:
+            print("⚠️ Không tìm thấy ffmpeg - dùng cv2.VideoWriter")
+            encoder = 'opencv'
+        outputs = sorted(outputs, key=lambda output: output[1])
+        video_writers = [(BackgroundVideoWriter(output_file, self.fps, (self.video_width, self.video_height),
+                                                backend=encoder, queue_size=self.encoder_queue_size), with_labels)
+                         for output_file, with_labels in outputs]
+        
+        plain_writers = [writer for writer, with_labels in video_writers if not with_labels]
+        label_writers = [writer for writer, with_labels in video_writers if with_labels]
+        
+        # Frame compositor + bảng tên nhãn (mã -1 -> "Unknown")
+        compositor = FrameCompositor(self)
+        label_names = None
+        if label_writers and recording.label_column is not None:
+            label_names = np.array(list(recording.label_names) + ["Unknown"], dtype=object)
         
         # Tạo từng frame
-        for frame_idx in range(len(df)):
-            row = df.iloc[frame_idx]
-            
-            # Tạo frame trống (đen)
-            frame = np.zeros((self.video_height, self.video_width, 3), dtype=np.uint8)
-            
-            # Extract keypoints
-            keypoints = self.extract_keypoints_from_row(row)
-            
-            # Main skeleton (normalized)
-            normalized_keypoints = self.normalize_skeleton(keypoints)
-            
-            # Vẽ skeleton lên frame
-            self.draw_skeleton_on_frame(frame, normalized_keypoints)
-            
-            # Picture-in-picture (original scale)
-            pip_width = int(self.video_width * self.pip_size)
-            pip_height = int(self.video_height * self.pip_size)
-            pip_x = self.video_width - pip_width - 20  # 20px margin từ bên phải
-            pip_y = self.video_height - pip_height - 20  # 20px margin từ dưới
-            
-            # Tạo PiP frame
-            pip_frame = np.zeros((pip_height, pip_width, 3), dtype=np.uint8)
-            
-            # Scale original keypoints để fit trong PiP
-            original_keypoints = keypoints.copy()
-            if not np.all(np.linalg.norm(original_keypoints, axis=1) == 0):
-                # Find bounding box
-                valid_points = original_keypoints[np.linalg.norm(original_keypoints, axis=1) > 0]
-                if len(valid_points) > 0:
-                    min_x, min_y = valid_points.min(axis=0)
-                    max_x, max_y = valid_points.max(axis=0)
+        frames_reported = 0
+        try:
+            for block_start, _, _, block_codes in recording.iter_blocks(self.block_size, start, end):
+                block_end = block_start + len(block_codes)
+                
+                # Decode + normalize block (kèm halo) một lần
+                halo_start = max(block_start - halo, 0)
+                block_keypoints = self.extract_keypoints_block(recording.keypoints[halo_start:min(block_end + halo, n_frames)])
+                block_normalized = self.normalize_skeleton_batch(block_keypoints, scale_smoothing=self.scale_smoothing)
+                
+                for frame_idx in range(block_start, block_end):
+                    i = frame_idx - halo_start
+                    frame = compositor.compose(frame_idx, block_normalized[i], block_keypoints[i])
                     
-                    # Scale để fit trong PiP
-                    scale_x = pip_width / (max_x - min_x) if (max_x - min_x) > 0 else 1
-                    scale_y = pip_height / (max_y - min_y) if (max_y - min_y) > 0 else 1
-                    scale = min(scale_x, scale_y) * 0.8  # 80% để có margin
+                    # Viết frame vào các video không labels
+                    for video_writer in plain_writers:
+                        video_writer.write(frame)
                     
-                    # Center trong PiP
-                    original_keypoints = (original_keypoints - [min_x, min_y]) * scale
-                    pip_center = np.array([pip_width/2, pip_height/2])
-                    current_center = np.mean(original_keypoints[np.linalg.norm(original_keypoints, axis=1) > 0], axis=0) if len(original_keypoints[np.linalg.norm(original_keypoints, axis=1) > 0]) > 0 else np.array([0, 0])
-                    original_keypoints = original_keypoints - current_center + pip_center
-            
-            # Vẽ skeleton lên PiP
-            self.draw_skeleton_on_frame(pip_frame, original_keypoints, alpha=0.8, linewidth=1)
-            
-            # Ghép PiP vào frame chính
-            frame[pip_y:pip_y+pip_height, pip_x:pip_x+pip_width] = pip_frame
-            
-            # Add labels nếu có
-            if with_labels:
-                # Tìm cột Action Label
-                action_cols = [col for col in df.columns if 'Action' in col and 'Label' in col]
-                if action_cols:
-                    action_col = action_cols[0]
-                    action_label = row[action_col] if not pd.isna(row[action_col]) else "Unknown"
+                    # Add labels nếu có
+                    if label_names is not None:
+                        compositor.add_label(frame, label_names[block_codes[frame_idx - block_start]])
                     
-                    # Hiển thị label
-                    cv2.putText(frame, f"Activity: {action_label}", (50, 50), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-            
-            # Add frame info
-            timestamp = frame_idx / self.fps
-            cv2.putText(frame, f"Frame: {frame_idx}", (self.video_width - 200, 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-            cv2.putText(frame, f"Time: {timestamp:.2f}s", (self.video_width - 200, 70), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-            
-            # Viết frame vào video
-            video_writer.write(frame)
-            
-            # Progress
-            if frame_idx % 100 == 0 or frame_idx == len(df) - 1:
-                print(f"\r🎬 Đang xử lý frame {frame_idx+1}/{len(df)} ({(frame_idx+1)/len(df)*100:.1f}%)", end='', flush=True)
-        
-        # Đóng video writer
-        video_writer.release()
+                    # Viết frame vào các video có labels
+                    for video_writer in label_writers:
+                        video_writer.write(frame)
+                    
+                    # Progress
+                    if frame_idx % 100 == 0 or frame_idx == end - 1:
+                        if progress_callback is not None:
+                            progress_callback(frame_idx + 1 - start - frames_reported)
+                            frames_reported = frame_idx + 1 - start
+                        else:
+                            print(f"\r🎬 Đang xử lý frame {frame_idx+1}/{n_frames} ({(frame_idx+1)/n_frames*100:.1f}%)", end='', flush=True)
+        except BaseException:
+            # Lỗi khi vẽ: vẫn dừng các encoder thread, giữ nguyên lỗi gốc
+            for video_writer, _ in video_writers:
+                with contextlib.suppress(Exception):
+                    video_writer.release()
+            raise
         
-        print(f"\n✅ Video đã được tạo: {output_file}")
-        print(f"📊 Thông tin: {len(df)} frames, {len(df)/self.fps:.1f} giây, {self.fps} FPS")
+        # Đóng video writer (chờ encode hết các frame còn trong hàng đợi)
+        errors = []
+        for video_writer, _ in video_writers:
+            try:
+                video_writer.release()
+            except RuntimeError as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
         
-        return output_file
+        return end - start
     
     def draw_skeleton_on_frame(self, frame, keypoints, alpha=1.0, linewidth=2):
         """Vẽ skeleton lên OpenCV frame"""
         
+        # Keypoint (0, 0) = missing; int() cắt phần thập phân như astype
+        valid = (keypoints != 0).any(axis=1)
+        points = keypoints.astype(np.int32)
+        
+        # Vẽ connections: một lần cv2.polylines cho mỗi nhóm màu
+        edge_valid = valid[self.edge_index].all(axis=1)
+        for color_bgr, edge_ids in self.edge_color_groups:
+            edge_ids = edge_ids[edge_valid[edge_ids]]
+            if len(edge_ids):
+                cv2.polylines(frame, list(points[self.edge_index[edge_ids]]), False, color_bgr, linewidth)
+        
+        # Vẽ keypoints: đóng dấu mẫu chấm tròn cho tất cả điểm hợp lệ cùng lúc
+        joint_ids = np.flatnonzero(valid)
+        if len(joint_ids) == 0:
+            return
+        
+        stamp_y, stamp_x = self.joint_stamp
+        ys = points[joint_ids, 1, None] + stamp_y
+        xs = points[joint_ids, 0, None] + stamp_x
+        inside = (ys >= 0) & (ys < frame.shape[0]) & (xs >= 0) & (xs < frame.shape[1])
+        colors = np.broadcast_to(self.joint_colors[joint_ids, None, :], ys.shape + (3,))
+        frame[ys[inside], xs[inside]] = colors[inside]
+    
+    def draw_skeleton_on_frame_legacy(self, frame, keypoints, alpha=1.0, linewidth=2):
+        """Vẽ skeleton từng cạnh/từng điểm (cách cũ, giữ lại để benchmark)"""
+        
         # Vẽ connections
         for connection in self.skeleton_connections:
             start_idx, end_idx = connection
@@ -421,17 +835,106 @@ class SkeletonVideoGenerator:
             
             cv2.circle(frame, (int(point[0]), int(point[1])), 4, color_bgr, -1)
     
-    def create_all_videos(self, max_frames_per_video=None):
-        """Tạo tất cả 8 videos cho 4 users"""
+    def benchmark_drawing(self, user_id='1', n_frames=500):
+        """So sánh thời gian vẽ mỗi frame: render plan vs cách cũ"""
+        
+        print(f"\n⏱️ Benchmark vẽ skeleton cho User {user_id} ({n_frames} frames)")
+        print("=" * 60)
+        
+        recording = self.load_keypoint_recording(user_id, with_labels=False)
+        all_keypoints = self.extract_keypoints_block(recording.keypoints[:n_frames])
+        all_normalized = self.normalize_skeleton_batch(all_keypoints, scale_smoothing=self.scale_smoothing)
+        
+        timings = {}
+        frames = {}
+        for name, draw_fn in (('legacy', self.draw_skeleton_on_frame_legacy), ('render_plan', self.draw_skeleton_on_frame)):
+            frame = np.zeros((self.video_height, self.video_width, 3), dtype=np.uint8)
+            checksum = 0
+            elapsed = 0.0
+            for keypoints in all_normalized:
+                frame.fill(0)
+                start_time = time.perf_counter()
+                draw_fn(frame, keypoints)
+                elapsed += time.perf_counter() - start_time
+                checksum += int(frame.sum(dtype=np.int64))
+            timings[name] = elapsed / max(len(all_normalized), 1) * 1000
+            frames[name] = checksum
+        
+        result = {
+            'n_frames': len(all_normalized),
+            'legacy_ms_per_frame': timings['legacy'],
+            'render_plan_ms_per_frame': timings['render_plan'],
+            'speedup': timings['legacy'] / timings['render_plan'] if timings['render_plan'] > 0 else float('nan'),
+            'identical': frames['legacy'] == frames['render_plan'],
+        }
+        
+        print(f"   🐢 Cách cũ:     {result['legacy_ms_per_frame']:.3f} ms/frame")
+        print(f"   🚀 Render plan: {result['render_plan_ms_per_frame']:.3f} ms/frame")
+        print(f"   ⚡ Tăng tốc: {result['speedup']:.2f}x | Kết quả giống nhau: {'✅' if result['identical'] else '❌'}")
+        
+        return result
+    
+    def check_normalization(self, user_id='1', n_frames=None):
+        """So sánh normalize_skeleton_batch với normalize_skeleton từng frame (phải bằng nhau tuyệt đối)"""
+        
+        print(f"\n🔍 Kiểm tra normalize batch vs từng frame cho User {user_id}")
+        print("=" * 60)
+        
+        recording = self.load_keypoint_recording(user_id, with_labels=False)
+        all_keypoints = self.extract_keypoints_block(recording.keypoints[:n_frames])
+        
+        batch = self.normalize_skeleton_batch(all_keypoints)
+        per_frame = np.array([self.normalize_skeleton(keypoints) for keypoints in all_keypoints]).reshape(batch.shape)
+        
+        mismatched = batch != per_frame
+        result = {
+            'n_frames': len(all_keypoints),
+            'n_mismatched': int(mismatched.sum()),
+            'max_abs_diff': float(np.abs(batch - per_frame).max()) if batch.size else 0.0,
+            'identical': bool(np.array_equal(batch, per_frame)),
+        }
+        
+        print(f"   📊 {result['n_frames']} frames, {result['n_mismatched']} toạ độ khác nhau "
+              f"(max {result['max_abs_diff']:.3g} pixel)")
+        print(f"   {'✅' if result['identical'] else '❌'} Kết quả giống hệt nhau: {result['identical']}")
+        
+        return result
+    
+    def create_all_videos(self, max_frames_per_video=None, workers=1, chunk_frames=None, single_pass=True):
+        """Tạo 2 videos (skeleton only + labels) cho mỗi user trong dataset"""
         
         print("🎬 TẠO TẤT CẢ SKELETON VIDEOS CHO ISAS CHALLENGE 2025")
         print("=" * 70)
         
-        users = ['1', '2', '3', '5']  # User IDs
+        users = self.manifest.subjects  # User IDs (tìm trong Train_Data)
+        
+        if workers and workers > 1:
+            created_videos = self._create_all_videos_parallel(users, max_frames_per_video, workers, chunk_frames, single_pass)
+        else:
+            created_videos = self._create_all_videos_sequential(users, max_frames_per_video, single_pass)
+        
+        print(f"\n🎉 HOÀN THÀNH TẠO VIDEOS!")
+        print("=" * 70)
+        print(f"✅ Đã tạo {len(created_videos)} videos:")
+        for video in created_videos:
+            file_size = os.path.getsize(video) / (1024*1024)  # MB
+            print(f"   📁 {video} ({file_size:.1f} MB)")
+        
+        return created_videos
+    
+    def _create_all_videos_sequential(self, users, max_frames_per_video=None, single_pass=True):
+        """Tạo videos lần lượt từng user trong process hiện tại"""
+        
         created_videos = []
         
         for user_id in users:
             try:
+                # Cả 2 video từ một lần decode/vẽ
+                if single_pass and self.can_share_keypoints(user_id):
+                    print(f"\n📽️ Tạo video skeleton + labels cho User {user_id} (single pass)...")
+                    created_videos.extend(self.create_user_videos(user_id, max_frames=max_frames_per_video))
+                    continue
+                
                 # Video 1: Skeleton only
                 print(f"\n📽️ Tạo video skeleton cho User {user_id}...")
                 video1 = self.create_skeleton_video(user_id, with_labels=False, max_frames=max_frames_per_video)
@@ -446,24 +949,198 @@ class SkeletonVideoGenerator:
                 print(f"❌ Lỗi khi tạo video cho User {user_id}: {e}")
                 continue
         
-        print(f"\n🎉 HOÀN THÀNH TẠO VIDEOS!")
-        print("=" * 70)
-        print(f"✅ Đã tạo {len(created_videos)} videos:")
-        for video in created_videos:
-            file_size = os.path.getsize(video) / (1024*1024)  # MB
-            print(f"   📁 {video} ({file_size:.1f} MB)")
+        return created_videos
+    
+    def _plan_video_jobs(self, users, max_frames_per_video=None, chunk_frames=None, single_pass=True):
+        """Chia công việc render thành các job (user, variants, đoạn frame)"""
+        
+        videos = []   # (user_id, with_labels, output_file, segment_files)
+        jobs = []     # (user_id, source_with_labels, max_frames, start, end, [(output_file, with_labels)])
+        if not users:
+            return videos, jobs
+        
+        segment_dir = os.path.join(os.path.dirname(self.get_output_file_path(users[0])), '.segments')
+        
+        for user_id in users:
+            try:
+                # Chỉ lọc theo metadata; worker so sánh toạ độ thật trước khi render chung
+                shared = single_pass and self.keypoint_metadata_match(user_id)
+                
+                # Build cache trước trong process chính để các worker chỉ memory-map
+                # (chỉ file nguồn cần render: dùng chung keypoints thì chỉ file có labels)
+                sources = (True,) if shared else (False, True)
+                recordings = {with_labels: self.keypoint_store.load(self.get_keypoint_file_path(user_id, with_labels))
+                              for with_labels in sources}
+            except Exception as e:
+                print(f"❌ Lỗi khi tạo video cho User {user_id}: {e}")
+                continue
+            
+            # Nhóm variant render chung: đọc từ file có labels nếu dùng chung keypoints
+            groups = [(True, (False, True))] if shared else [(False, (False,)), (True, (True,))]
+            
+            for source_with_labels, variants in groups:
+                n_frames = len(recordings[source_with_labels])
+                if max_frames_per_video and n_frames > max_frames_per_video:
+                    n_frames = max_frames_per_video
+                
+                output_files = {with_labels: self.get_output_file_path(user_id, with_labels) for with_labels in variants}
+                
+                if chunk_frames and n_frames > chunk_frames:
+                    os.makedirs(segment_dir, exist_ok=True)
+                    segment_files = {with_labels: [] for with_labels in variants}
+                    for start in range(0, n_frames, chunk_frames):
+                        end = min(start + chunk_frames, n_frames)
+                        outputs = []
+                        for with_labels in variants:
+                            stem = os.path.splitext(os.path.basename(output_files[with_labels]))[0]
+                            segment_file = os.path.join(segment_dir, f"{stem}_{start:08d}.mp4")
+                            segment_files[with_labels].append(segment_file)
+                            outputs.append((segment_file, with_labels))
+                        jobs.append((user_id, source_with_labels, max_frames_per_video, start, end, outputs))
+                else:
+                    segment_files = {with_labels: None for with_labels in variants}
+                    outputs = [(output_files[with_labels], with_labels) for with_labels in variants]
+                    jobs.append((user_id, source_with_labels, max_frames_per_video, 0, n_frames, outputs))
+                
+                for with_labels in variants:
+                    videos.append((user_id, with_labels, output_files[with_labels], segment_files[with_labels]))
+        
+        return videos, jobs
+    
+    def _concat_segments(self, segment_files, output_file):
+        """Nối các đoạn video bằng ffmpeg concat (copy stream, không encode lại)"""
+        
+        list_file = output_file + '.segments.txt'
+        with open(list_file, 'w', encoding='utf-8') as f:
+            for segment_file in segment_files:
+                f.write(f"file '{os.path.abspath(segment_file)}'\n")
+        
+        try:
+            subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+                            '-i', list_file, '-c', 'copy', output_file], check=True)
+        finally:
+            os.remove(list_file)
+            for segment_file in segment_files:
+                if os.path.exists(segment_file):
+                    os.remove(segment_file)
+    
+    def _create_all_videos_parallel(self, users, max_frames_per_video=None, workers=2, chunk_frames=None, single_pass=True):
+        """Tạo videos song song bằng nhiều process"""
+        
+        if chunk_frames and shutil.which('ffmpeg') is None:
+            print("⚠️ Không tìm thấy ffmpeg - tắt chia đoạn, mỗi video do một worker render")
+            chunk_frames = None
+        
+        videos, jobs = self._plan_video_jobs(users, max_frames_per_video, chunk_frames, single_pass)
+        total_frames = sum(end - start for _, _, _, start, end, _ in jobs)
+        
+        print(f"\n⚡ Render song song: {len(videos)} videos, {len(jobs)} jobs, {workers} workers, {total_frames:,} frames")
+        
+        failed_jobs = {}
+        done_frames = 0
+        
+        with multiprocessing.Manager() as manager:
+            progress_queue = manager.Queue()
+            
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                pending = {executor.submit(_render_video_job, self, job, progress_queue): job for job in jobs}
+                
+                while pending:
+                    finished, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                    
+                    # Gom tiến độ từ tất cả worker
+                    new_frames = 0
+                    while not progress_queue.empty():
+                        new_frames += progress_queue.get()
+                    if new_frames:
+                        done_frames += new_frames
+                        print(f"\r🎬 Đang xử lý frame {done_frames:,}/{total_frames:,} ({done_frames/total_frames*100:.1f}%)", end='', flush=True)
+                    
+                    for future in finished:
+                        job = pending.pop(future)
+                        try:
+                            future.result()
+                        except Exception as e:
+                            for _, with_labels in job[5]:
+                                failed_jobs[(job[0], with_labels)] = e
+        
+        print()
+        
+        created_videos = []
+        for user_id, with_labels, output_file, segment_files in videos:
+            error = failed_jobs.get((user_id, with_labels))
+            if error is None and segment_files:
+                try:
+                    self._concat_segments(segment_files, output_file)
+                except Exception as e:
+                    error = e
+            
+            if error is not None:
+                print(f"❌ Lỗi khi tạo video cho User {user_id}: {error}")
+                continue
+            
+            created_videos.append(output_file)
         
         return created_videos
 
 
+def _render_video_job(generator, job, progress_queue):
+    """Worker: render một đoạn frame của một video (chạy trong process con)"""
+    
+    user_id, source_with_labels, max_frames, start, end, outputs = job
+    
+    # Tắt log của từng worker, tiến độ được gửi về process chính qua queue
+    with contextlib.redirect_stdout(io.StringIO()):
+        recording = generator.load_keypoint_recording(user_id, source_with_labels)
+        
+        # Job dùng chung keypoints chỉ mới lọc theo metadata: xác nhận trên toạ độ thật
+        # (cache file không labels được build tại đây). Khác nhau -> render riêng từ đúng file nguồn
+        if len(outputs) > 1 and not generator.can_share_keypoints(user_id):
+            plain_recording = generator.load_keypoint_recording(user_id, with_labels=False)
+            generator.render_video_range(plain_recording, [output for output in outputs if not output[1]],
+                                         start, end, max_frames=max_frames)
+            outputs = [output for output in outputs if output[1]]
+        
+        return generator.render_video_range(recording, outputs, start, end, max_frames=max_frames,
+                                            progress_callback=progress_queue.put)
+
+
 def main():
     """Main function"""
     
+    parser = argparse.ArgumentParser(description="Tạo skeleton videos cho ISAS Challenge 2025")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Số process render song song (1 = tuần tự)")
+    parser.add_argument('--chunk-frames', type=int, default=None,
+                        help="Chia video thành các đoạn N frames để render song song (cần ffmpeg)")
+    parser.add_argument('--max-frames', type=int, default=None,
+                        help="Giới hạn số frame mỗi video (mặc định: toàn bộ)")
+    parser.add_argument('--separate-passes', action='store_true',
+                        help="Render 2 video của mỗi user riêng biệt (không dùng chung một lần vẽ)")
+    parser.add_argument('--encoder', choices=['opencv', 'ffmpeg'], default='opencv',
+                        help="Backend encode video: cv2.VideoWriter (mp4v) hoặc pipe raw frames sang ffmpeg")
+    parser.add_argument('--benchmark-draw', action='store_true',
+                        help="Chỉ đo thời gian vẽ mỗi frame (render plan vs cách cũ)")
+    parser.add_argument('--check-normalization', action='store_true',
+                        help="Chỉ kiểm tra normalize theo batch khớp tuyệt đối với normalize từng frame")
+    args = parser.parse_args()
+    
     # Khởi tạo generator
     generator = SkeletonVideoGenerator()
+    generator.encoder = args.encoder
+    
+    if args.benchmark_draw:
+        generator.benchmark_drawing(n_frames=args.max_frames or 500)
+        return
+    
+    if args.check_normalization:
+        generator.check_normalization(n_frames=args.max_frames)
+        return
     
     # Tạo tất cả videos (load hết tất cả frames)
-    videos = generator.create_all_videos(max_frames_per_video=None)  # None = load hết data
+    videos = generator.create_all_videos(max_frames_per_video=args.max_frames,  # None = load hết data
+                                         workers=args.workers, chunk_frames=args.chunk_frames,
+                                         single_pass=not args.separate_passes)
     
     print(f"\n💡 Videos được tạo với toàn bộ data")
     print(f"📁 Videos được lưu trong: ../output/videos/")
@@ -0,0 +1,163 @@
+"""
+ISAS Challenge 2025 - Window Builder
+Chia dữ liệu keypoint theo subject thành các window overlap (view zero-copy)
+
+Tính năng:
+- Chuyển mỗi subject sang mảng float32 liên tục (frames × 17 × 2) đúng một lần
+- Tất cả window là view sliding_window_view (không copy DataFrame / mảng)
+- Nhãn đa số của mọi window tính bằng prefix sum số frame theo nhãn (rolling_stats)
+  (hoà thì chọn nhãn xuất hiện trước, giống value_counts của pandas)
+- Tóm tắt nhãn theo window (số frame có nhãn, số lần chuyển nhãn) với chi phí O(N),
+  đủ rẻ để quét nhiều window_size
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from rolling_stats import next_valid_index, prefix_sums, range_sums, valid_differences
+from window_features import keypoints_from_dataframe
+
+
+def window_step(window_size, overlap_ratio=0.5):
+    """Bước nhảy giữa hai window liên tiếp"""
+    step = int(window_size * (1 - overlap_ratio))
+    if step <= 0:
+        raise ValueError(f"overlap_ratio={overlap_ratio} cho step={step} (cần step >= 1)")
+    return step
+
+
+def window_starts(n_frames, window_size, step):
+    """Frame bắt đầu của các window đầy đủ"""
+    return np.arange(0, max(n_frames - window_size + 1, 0), step)
+
+
+def sliding_windows(array, window_size, step):
+    """View (windows, window_size, ...) trên trục frame của array, không copy dữ liệu"""
+
+    if len(array) < window_size:
+        return np.empty((0, window_size) + array.shape[1:], dtype=array.dtype)
+
+    view = sliding_window_view(array, window_size, axis=0)[::step]
+    # sliding_window_view đặt trục window ở cuối -> đưa về sau trục window index
+    return np.moveaxis(view, -1, 1)
+
+
+def window_label_counts(label_codes, n_labels, window_size, step):
+    """Số frame theo nhãn của mọi window: (counts (W, n_labels), vị trí xuất hiện đầu tiên (W, n_labels))
+
+    Mã nhãn -1 (không có nhãn) không được đếm. Nhãn không có trong window -> vị trí = window_size.
+    """
+
+    label_codes = np.asarray(label_codes)
+    starts = window_starts(len(label_codes), window_size, step)
+    ends = starts + window_size
+
+    # Prefix sum one-hot: số frame của mỗi nhãn trong [start, end) = hiệu hai dòng
+    one_hot = label_codes[:, np.newaxis] == np.arange(n_labels)
+    counts = range_sums(prefix_sums(one_hot.astype(np.int64)), starts, ends)
+
+    first_seen = np.minimum(next_valid_index(one_hot)[starts], ends[:, np.newaxis]) - starts[:, np.newaxis]
+    return counts, first_seen
+
+
+def window_label_transitions(label_codes, window_size, step):
+    """Số lần đổi nhãn (giữa hai frame có nhãn liên tiếp) trong mọi window"""
+
+    label_codes = np.asarray(label_codes)
+    labeled = label_codes >= 0
+    starts = window_starts(len(label_codes), window_size, step)
+    ends = starts + window_size
+
+    changes, has_previous = valid_differences(label_codes, labeled)
+    changed = has_previous & (changes != 0)
+
+    # Bỏ frame có nhãn đầu tiên của window (frame trước nó nằm ngoài window)
+    first = next_valid_index(labeled)[starts]
+    return range_sums(prefix_sums(changed.astype(np.int64)), np.minimum(first + 1, ends), ends)
+
+
+def window_majority_labels(label_codes, n_labels, window_size, step):
+    """Nhãn đa số của mọi window: (mã nhãn (W,), số frame của nhãn đó (W,))
+
+    Window không có frame nào có nhãn -> mã -1, count 0.
+    """
+
+    counts, first_seen = window_label_counts(label_codes, n_labels, window_size, step)
+    if counts.size == 0:
+        return np.full(len(counts), -1, dtype=np.int64), np.zeros(len(counts), dtype=np.int64)
+
+    # Nhiều frame hơn thắng; hoà thì nhãn xuất hiện trước thắng
+    priority = counts * (window_size + 1) + (window_size - first_seen)
+    dominant = priority.argmax(axis=1)
+    dominant_counts = counts[np.arange(len(counts)), dominant]
+    return np.where(dominant_counts > 0, dominant, -1), dominant_counts
+
+
+def window_label_summary(label_codes, n_labels, window_size, step):
+    """Tóm tắt nhãn của mọi window cho phân tích EDA: dict tên -> mảng (W, ...)
+
+    starts, labeled_frames, counts (W, n_labels), first_seen (W, n_labels), transitions.
+    """
+
+    label_codes = np.asarray(label_codes)
+    starts = window_starts(len(label_codes), window_size, step)
+    counts, first_seen = window_label_counts(label_codes, n_labels, window_size, step)
+
+    return {
+        'starts': starts,
+        'labeled_frames': counts.sum(axis=1),
+        'counts': counts,
+        'first_seen': first_seen,
+        'transitions': window_label_transitions(label_codes, window_size, step),
+    }
+
+
+class SubjectArrays:
+    """Dữ liệu một subject dạng mảng: keypoints (frames, 17, 2) float32 + mã nhãn"""
+
+    def __init__(self, subject, keypoints, label_codes, label_names):
+        self.subject = subject
+        self.keypoints = keypoints          # (N, 17, 2) float32, NaN = không hợp lệ
+        self.label_codes = label_codes      # (N,) int64, -1 = không có nhãn
+        self.label_names = label_names      # Mã -> tên nhãn (dùng chung cho mọi subject)
+
+    def __len__(self):
+        return len(self.keypoints)
+
+    def window_starts(self, window_size, overlap_ratio=0.5):
+        return window_starts(len(self), window_size, window_step(window_size, overlap_ratio))
+
+    def windows(self, window_size, overlap_ratio=0.5):
+        """View (W, window_size, 17, 2) của tất cả window"""
+        return sliding_windows(self.keypoints, window_size, window_step(window_size, overlap_ratio))
+
+    def window_labels(self, window_size, overlap_ratio=0.5):
+        """(tên nhãn đa số (W,) - None nếu không có nhãn, tỷ lệ frame của nhãn đó (W,))"""
+
+        codes, counts = window_majority_labels(self.label_codes, len(self.label_names), window_size,
+                                               window_step(window_size, overlap_ratio))
+        names = np.array([self.label_names[code] if code >= 0 else None for code in codes], dtype=object)
+        return names, counts / window_size
+
+
+def build_subject_arrays(data, action_col, subject_col='subject_id', dtype=np.float32):
+    """DataFrame nhiều subject -> {subject: SubjectArrays} (giữ thứ tự xuất hiện của subject)
+
+    Mỗi subject được chuyển sang mảng liên tục đúng một lần; mã nhãn dùng chung một từ điển.
+    """
+
+    label_codes, label_names = pd.factorize(data[action_col])
+    label_names = list(label_names)
+    keypoints = keypoints_from_dataframe(data, dtype=dtype)
+
+    # Vị trí (không phải index label) các dòng của từng subject, theo thứ tự frame
+    positions = data.groupby(subject_col, sort=False).indices
+
+    subjects = {}
+    for subject in data[subject_col].unique():
+        rows = positions[subject]
+        subjects[subject] = SubjectArrays(subject, np.ascontiguousarray(keypoints[rows]),
+                                          label_codes[rows].astype(np.int64), label_names)
+
+    return subjects
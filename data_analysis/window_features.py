@@ -0,0 +1,240 @@
+"""
+ISAS Challenge 2025 - Window Features
+Trích xuất đặc trưng theo window bằng NumPy (thay cho vòng lặp iterrows trong notebook)
+
+Tính năng:
+- Tensor keypoints (windows, frames, 17, 2), NaN = keypoint không hợp lệ
+- Bbox từng frame (min/max, width/height/area/aspect/perimeter) bằng masked reduction
+- Thống kê, đạo hàm và dịch chuyển tâm bbox cho tất cả window cùng lúc
+- Kết quả giống ISASWindowFeatureExtractor.extract_bounding_box_features
+  (frame không có điểm hợp lệ bị bỏ qua, đạo hàm tính trên các frame còn lại)
+- rolling_bbox_features: cùng đặc trưng từ chuỗi bbox của cả subject bằng rolling_stats,
+  chi phí không phụ thuộc window_size
+"""
+
+import numpy as np
+
+from keypoint_store import KEYPOINT_NAMES
+from rolling_stats import RollingStats, next_valid_index, valid_differences
+
+BBOX_METRICS = ('width', 'height', 'area', 'aspect_ratio', 'perimeter')
+
+EPSILON = 1e-8
+DEFAULT_WINDOW_BATCH = 512    # Số window xử lý mỗi lần (giới hạn RAM của tensor float64)
+
+
+def keypoints_from_dataframe(df, dtype=np.float64):
+    """DataFrame có cột {keypoint}_x/_y -> mảng (frames, 17, 2), keypoint thiếu cột = NaN"""
+
+    keypoints = np.full((len(df), len(KEYPOINT_NAMES), 2), np.nan, dtype=dtype)
+    for kp_idx, kp_name in enumerate(KEYPOINT_NAMES):
+        x_col, y_col = f"{kp_name}_x", f"{kp_name}_y"
+        if x_col in df.columns and y_col in df.columns:
+            keypoints[:, kp_idx, 0] = df[x_col].to_numpy(dtype=dtype, na_value=np.nan)
+            keypoints[:, kp_idx, 1] = df[y_col].to_numpy(dtype=dtype, na_value=np.nan)
+    return keypoints
+
+
+def bbox_series(keypoints):
+    """Bbox từng frame của tensor (..., frames, 17, 2)
+
+    Trả về (dict metric -> (..., frames), (center_x, center_y), mask frame hợp lệ).
+    Frame hợp lệ khi có ít nhất một x và một y không NaN.
+    """
+
+    x = keypoints[..., 0]
+    y = keypoints[..., 1]
+    valid = ~np.isnan(x).all(axis=-1) & ~np.isnan(y).all(axis=-1)
+
+    # fmin/fmax bỏ qua NaN (frame toàn NaN -> NaN, không cảnh báo)
+    min_x, max_x = np.fmin.reduce(x, axis=-1), np.fmax.reduce(x, axis=-1)
+    min_y, max_y = np.fmin.reduce(y, axis=-1), np.fmax.reduce(y, axis=-1)
+
+    width = max_x - min_x
+    height = max_y - min_y
+    series = {
+        'width': width,
+        'height': height,
+        'area': width * height,
+        'aspect_ratio': height / (width + EPSILON),
+        'perimeter': 2 * (width + height),
+    }
+    center = ((min_x + max_x) / 2, (min_y + max_y) / 2)
+    return series, center, valid
+
+
+def compact_valid(values, valid):
+    """Dồn các frame hợp lệ lên đầu trục cuối (giữ thứ tự), trả về (values, số frame hợp lệ)"""
+    order = np.argsort(~valid, axis=-1, kind='stable')
+    return np.take_along_axis(values, order, axis=-1), valid.sum(axis=-1)
+
+
+def masked_stats(values, counts):
+    """mean/std/min/max của values[..., :counts] (window có counts == 0 -> NaN)"""
+
+    mask = np.arange(values.shape[-1]) < counts[..., np.newaxis]
+    safe_counts = np.maximum(counts, 1)
+
+    mean = np.where(mask, values, 0).sum(axis=-1) / safe_counts
+    deviation = np.where(mask, values - mean[..., np.newaxis], 0)
+    std = np.sqrt((deviation ** 2).sum(axis=-1) / safe_counts)
+    minimum = np.where(mask, values, np.inf).min(axis=-1, initial=np.inf)
+    maximum = np.where(mask, values, -np.inf).max(axis=-1, initial=-np.inf)
+
+    empty = counts == 0
+    return tuple(np.where(empty, np.nan, stat) for stat in (mean, std, minimum, maximum))
+
+
+def bbox_features_from_series(series, center, valid):
+    """Đặc trưng bbox từ chuỗi bbox từng frame đã tính sẵn (metric -> (W, frames), tâm, mask)"""
+
+    center_x, center_y = center
+    features = {}
+
+    for metric in BBOX_METRICS:
+        values, counts = compact_valid(series[metric], valid)
+        mean, std, minimum, maximum = masked_stats(values, counts)
+        features[f'bbox_{metric}_mean'] = mean
+        features[f'bbox_{metric}_std'] = std
+        features[f'bbox_{metric}_min'] = minimum
+        features[f'bbox_{metric}_max'] = maximum
+        features[f'bbox_{metric}_range'] = maximum - minimum
+        features[f'bbox_{metric}_cv'] = std / (mean + EPSILON)
+
+        # Đạo hàm theo thời gian (cần >= 2 / >= 3 frame hợp lệ)
+        diff1 = np.diff(values, axis=-1)
+        velocity_mean, velocity_std, _, _ = masked_stats(diff1, np.maximum(counts - 1, 0))
+        features[f'bbox_{metric}_velocity_mean'] = np.where(counts > 1, velocity_mean, np.nan)
+        features[f'bbox_{metric}_velocity_std'] = np.where(counts > 1, velocity_std, np.nan)
+
+        diff2 = np.diff(diff1, axis=-1)
+        accel_mean, accel_std, _, _ = masked_stats(diff2, np.maximum(counts - 2, 0))
+        features[f'bbox_{metric}_accel_mean'] = np.where(counts > 2, accel_mean, np.nan)
+        features[f'bbox_{metric}_accel_std'] = np.where(counts > 2, accel_std, np.nan)
+
+    # Dịch chuyển tâm bbox giữa các frame hợp lệ liên tiếp
+    center_x, counts = compact_valid(center_x, valid)
+    center_y, _ = compact_valid(center_y, valid)
+    displacements = np.hypot(np.diff(center_x, axis=-1), np.diff(center_y, axis=-1))
+    n_displacements = np.maximum(counts - 1, 0)
+
+    mean, std, _, maximum = masked_stats(displacements, n_displacements)
+    has_path = counts > 1
+    features['bbox_total_displacement'] = np.where(has_path, mean * n_displacements, np.nan)
+    features['bbox_avg_displacement'] = np.where(has_path, mean, np.nan)
+    features['bbox_max_displacement'] = np.where(has_path, maximum, np.nan)
+    features['bbox_displacement_std'] = np.where(has_path, std, np.nan)
+
+    # Độ mượt quỹ đạo (cần > 2 dịch chuyển)
+    changes = np.abs(np.diff(displacements, axis=-1))
+    changes_mean, _, _, _ = masked_stats(changes, np.maximum(n_displacements - 1, 0))
+    features['bbox_path_smoothness'] = np.where(n_displacements > 2, -changes_mean, np.nan)
+
+    return features
+
+
+def _bbox_features(windows):
+    """Đặc trưng bbox cho một batch tensor (W, frames, 17, 2) float64"""
+    series, center, valid = bbox_series(windows)
+    return bbox_features_from_series(series, center, valid)
+
+
+def rolling_bbox_features(series, center, valid, starts, window_size):
+    """Đặc trưng bbox của các window [start, start + window_size) trên chuỗi bbox cả subject
+
+    series: metric -> (N,), center: (center_x, center_y), valid: (N,). Cùng key và ý nghĩa
+    với bbox_features_from_series; mean/std/min/max lấy từ RollingStats (prefix sum, sparse table).
+    Đạo hàm là hiệu giữa các frame hợp lệ liên tiếp: trong window bỏ hiệu đầu tiên (frame trước
+    nằm ngoài window), đạo hàm bậc 2 bỏ thêm một hiệu nữa.
+    """
+
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = starts + window_size
+
+    # Frame hợp lệ thứ nhất / thứ hai của mỗi window -> khoảng chứa hiệu bậc 1 / bậc 2
+    next_valid = next_valid_index(valid)
+    first = next_valid[starts]
+    second = next_valid[np.minimum(first + 1, len(valid))]
+    diff1_starts = np.minimum(first + 1, ends)
+    diff2_starts = np.minimum(second + 1, ends)
+
+    values = np.column_stack([series[metric] for metric in BBOX_METRICS])
+    diff1, has_diff1 = valid_differences(values, valid)
+    diff2, has_diff2 = valid_differences(diff1, has_diff1)
+
+    base = RollingStats(values, valid, max_length=window_size)
+    counts, mean, std = base.moments(starts, ends)
+    minimum, maximum = base.extrema(starts, ends)
+    # Có sparse table để khoảng hằng (ví dụ pose đứng yên) có std = 0 chính xác
+    velocity = RollingStats(diff1, has_diff1, max_length=window_size)
+    _, velocity_mean, velocity_std = velocity.moments(diff1_starts, ends)
+    _, accel_mean, accel_std = RollingStats(diff2, has_diff2, max_length=window_size).moments(diff2_starts, ends)
+
+    features = {}
+    for col, metric in enumerate(BBOX_METRICS):
+        features[f'bbox_{metric}_mean'] = mean[:, col]
+        features[f'bbox_{metric}_std'] = std[:, col]
+        features[f'bbox_{metric}_min'] = minimum[:, col]
+        features[f'bbox_{metric}_max'] = maximum[:, col]
+        features[f'bbox_{metric}_range'] = maximum[:, col] - minimum[:, col]
+        features[f'bbox_{metric}_cv'] = std[:, col] / (mean[:, col] + EPSILON)
+        features[f'bbox_{metric}_velocity_mean'] = np.where(counts > 1, velocity_mean[:, col], np.nan)
+        features[f'bbox_{metric}_velocity_std'] = np.where(counts > 1, velocity_std[:, col], np.nan)
+        features[f'bbox_{metric}_accel_mean'] = np.where(counts > 2, accel_mean[:, col], np.nan)
+        features[f'bbox_{metric}_accel_std'] = np.where(counts > 2, accel_std[:, col], np.nan)
+
+    # Dịch chuyển tâm bbox giữa các frame hợp lệ liên tiếp
+    center_diff, _ = valid_differences(np.column_stack(center), valid)
+    displacements = np.hypot(center_diff[:, 0], center_diff[:, 1])
+    path = RollingStats(displacements, has_diff1, max_length=window_size)
+    n_displacements, displacement_mean, displacement_std = path.moments(diff1_starts, ends)
+    _, displacement_max = path.extrema(diff1_starts, ends)
+
+    has_path = counts > 1
+    features['bbox_total_displacement'] = np.where(has_path, path.sum(diff1_starts, ends), np.nan)
+    features['bbox_avg_displacement'] = np.where(has_path, displacement_mean, np.nan)
+    features['bbox_max_displacement'] = np.where(has_path, displacement_max, np.nan)
+    features['bbox_displacement_std'] = np.where(has_path, displacement_std, np.nan)
+
+    # Độ mượt quỹ đạo (cần > 2 dịch chuyển)
+    changes, has_change = valid_differences(displacements, has_diff1)
+    _, changes_mean, _ = RollingStats(np.abs(changes), has_change, extrema=False).moments(diff2_starts, ends)
+    features['bbox_path_smoothness'] = np.where(n_displacements > 2, -changes_mean, np.nan)
+
+    return features
+
+
+def extract_bbox_features_batch(windows, batch_size=DEFAULT_WINDOW_BATCH, indices=None):
+    """Đặc trưng bbox cho tất cả window: tensor (W, frames, 17, 2) -> dict tên -> mảng (W,)
+
+    windows có thể là view zero-copy (window_builder.sliding_windows); indices chọn
+    một phần window, mỗi lần chỉ copy một batch sang float64.
+    NaN = đặc trưng không tính được (tương ứng key bị thiếu ở bản iterrows).
+    """
+
+    if indices is None:
+        indices = np.arange(len(windows))
+
+    if len(indices) == 0:
+        return _bbox_features(np.empty((0,) + np.shape(windows)[1:], dtype=np.float64))
+
+    batches = []
+    for start in range(0, len(indices), batch_size):
+        batch = np.asarray(windows[indices[start:start + batch_size]], dtype=np.float64)
+        batches.append(_bbox_features(batch))
+
+    return {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
+
+
+def feature_records(features):
+    """dict tên -> mảng (W,) -> list W dict (bỏ đặc trưng NaN, giữ thứ tự tên)"""
+
+    names = list(features)
+    if not names:
+        return []
+
+    matrix = np.column_stack([features[name] for name in names])
+    return [
+        {name: value for name, value in zip(names, row.tolist()) if not np.isnan(value)}
+        for row in matrix
+    ]
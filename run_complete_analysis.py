@@ -3,15 +3,73 @@
 🚀 ISAS Challenge 2025 - Complete Data Analysis Suite
 Chạy toàn bộ phân tích dữ liệu một lần với đầy đủ biểu đồ và báo cáo
 
+Các bước (phase) gọi trực tiếp ISASAnalyzer trong data_analysis/isas_analysis_complete.py:
+    overview    Tổng quan dữ liệu (keypoint / label / timetable)
+    activities  Phân tích hoạt động (cần overview)
+    quality     Chất lượng keypoints
+    charts      Biểu đồ (cần activities + quality)
+    report      Báo cáo markdown (cần overview + activities + quality)
+
+Ví dụ:
+    python run_complete_analysis.py
+    python run_complete_analysis.py --phases overview,quality --subjects 1,2
+    python run_complete_analysis.py --workers 0 --no-charts
+
 Author: ISAS Analysis Tool
 Created: 2025-06-01
 """
 
+import argparse
+import importlib.util
 import os
 import sys
 import time
 from datetime import datetime
 
+DATA_ANALYSIS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_analysis')
+
+PHASES = ('overview', 'activities', 'quality', 'charts', 'report')
+
+# Phase -> các phase phải chạy trước (kết quả nằm trong analyzer)
+PHASE_DEPENDENCIES = {
+    'overview': (),
+    'activities': ('overview',),
+    'quality': (),
+    'charts': ('overview', 'activities', 'quality'),
+    'report': ('overview', 'activities', 'quality'),
+}
+
+PHASE_TITLES = {
+    'overview': "Kiểm tra tổng quan dữ liệu",
+    'activities': "Phân tích hoạt động",
+    'quality': "Phân tích chất lượng keypoints",
+    'charts': "Tạo biểu đồ visualization",
+    'report': "Tạo báo cáo tổng kết",
+}
+
+# Package cần cho từng phase (chỉ kiểm tra phase được chọn, không import)
+PHASE_PACKAGES = {
+    'overview': ('pandas', 'numpy'),
+    'activities': ('pandas', 'numpy'),
+    'quality': ('pandas', 'numpy'),
+    'charts': ('matplotlib', 'seaborn'),
+    'report': (),
+}
+
+REQUIRED_DIRS = (
+    'Train_Data/keypoint',
+    'Train_Data/keypointlabel',
+    'Train_Data/timetable/csv',
+)
+
+OUTPUT_FILES = (
+    ("output/comprehensive_analysis_report.md", "📄 Báo cáo chi tiết", 'report'),
+    ("output/charts/activity_distribution_analysis.png", "📊 Biểu đồ phân phối hoạt động", 'charts'),
+    ("output/charts/keypoint_quality_analysis.png", "🎯 Biểu đồ chất lượng keypoints", 'charts'),
+    ("output/charts/comprehensive_summary.png", "📈 Biểu đồ tổng kết", 'charts'),
+)
+
+
 def print_header():
     """In header chương trình"""
     print("🚀" + "=" * 80 + "🚀")
@@ -21,37 +79,49 @@ def print_header():
     print(f"📅 Thời gian bắt đầu: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print()
 
-def check_requirements():
-    """Kiểm tra các yêu cầu cần thiết"""
+def resolve_phases(requested):
+    """Thêm các phase phụ thuộc, trả về list theo thứ tự chuẩn"""
+    selected = set()
+    pending = list(requested)
+    while pending:
+        phase = pending.pop()
+        if phase not in selected:
+            selected.add(phase)
+            pending.extend(PHASE_DEPENDENCIES[phase])
+    
+    added = sorted(selected - set(requested), key=PHASES.index)
+    if added:
+        print(f"ℹ️  Tự động thêm phase phụ thuộc: {', '.join(added)}")
+    return [phase for phase in PHASES if phase in selected]
+
+def check_requirements(phases):
+    """Kiểm tra các yêu cầu cần thiết cho các phase được chọn (không import package)"""
     print("🔍 KIỂM TRA YÊU CẦU SYSTEM...")
     print("-" * 50)
     
-    # Kiểm tra Python packages
-    required_packages = ['pandas', 'numpy', 'matplotlib', 'seaborn']
+    # Kiểm tra Python packages (find_spec không import package nặng)
+    required_packages = []
+    for phase in phases:
+        for package in PHASE_PACKAGES[phase]:
+            if package not in required_packages:
+                required_packages.append(package)
     missing_packages = []
     
     for package in required_packages:
-        try:
-            __import__(package)
+        if importlib.util.find_spec(package) is not None:
             print(f"✅ {package}: Đã cài đặt")
-        except ImportError:
+        else:
             missing_packages.append(package)
             print(f"❌ {package}: Chưa cài đặt")
     
     if missing_packages:
         print(f"\n⚠️  Cần cài đặt các packages: {', '.join(missing_packages)}")
-        print("   Chạy: pip install pandas numpy matplotlib seaborn")
+        print(f"   Chạy: pip install {' '.join(missing_packages)}")
         return False
     
     # Kiểm tra cấu trúc thư mục
-    required_dirs = [
-        'Train_Data/keypoint',
-        'Train_Data/keypointlabel', 
-        'Train_Data/timetable/csv'
-    ]
-    
     missing_dirs = []
-    for dir_path in required_dirs:
+    for dir_path in REQUIRED_DIRS:
         if not os.path.exists(dir_path):
             missing_dirs.append(dir_path)
             print(f"❌ Thư mục không tồn tại: {dir_path}")
@@ -66,7 +136,7 @@ def check_requirements():
     return True
 
 def run_step(step_name, step_function, *args, **kwargs):
-    """Chạy một bước phân tích với error handling"""
+    """Chạy một bước phân tích với error handling, trả về (kết quả, thành công, thời gian)"""
     print(f"\n🔄 Đang thực hiện: {step_name}")
     print("-" * 60)
     
@@ -76,130 +146,113 @@ def run_step(step_name, step_function, *args, **kwargs):
         result = step_function(*args, **kwargs)
         elapsed_time = time.time() - start_time
         print(f"✅ Hoàn thành: {step_name} ({elapsed_time:.1f}s)")
-        return result, True
+        return result, True, elapsed_time
     except Exception as e:
         elapsed_time = time.time() - start_time
         print(f"❌ Lỗi trong {step_name} ({elapsed_time:.1f}s): {e}")
         import traceback
         traceback.print_exc()
-        return None, False
+        return None, False, elapsed_time
 
-def run_individual_checks():
-    """Chạy các kiểm tra riêng lẻ"""
-    print("\n📋 CHẠY CÁC KIỂM TRA RIÊNG LẺ...")
-    print("=" * 60)
-    
-    steps_completed = []
-    steps_failed = []
-    
-    # Step 1: Data Overview
-    try:
-        from data_analysis import _1_data_overview as step1
-        _, success = run_step("Kiểm tra tổng quan dữ liệu", step1.check_data_overview)
-        if success:
-            steps_completed.append("✅ Data Overview")
-        else:
-            steps_failed.append("❌ Data Overview")
-    except Exception as e:
-        print(f"❌ Không thể import step 1: {e}")
-        steps_failed.append("❌ Data Overview")
-    
-    # Step 2: Activity Analysis
-    try:
-        from data_analysis import _2_activity_analysis as step2
-        _, success1 = run_step("Phân tích hoạt động", step2.analyze_activities)
-        _, success2 = run_step("Kiểm tra nhãn nhất quán", step2.check_label_consistency)
-        if success1 and success2:
-            steps_completed.append("✅ Activity Analysis")
-        else:
-            steps_failed.append("❌ Activity Analysis")
-    except Exception as e:
-        print(f"❌ Không thể import step 2: {e}")
-        steps_failed.append("❌ Activity Analysis")
-    
-    # Step 3: Keypoint Analysis
-    try:
-        from data_analysis import _3_keypoint_analysis as step3
-        _, success1 = run_step("Phân tích keypoints", step3.analyze_keypoints)
-        _, success2 = run_step("Kiểm tra chất lượng", step3.check_data_quality)
-        if success1 and success2:
-            steps_completed.append("✅ Keypoint Analysis")
-        else:
-            steps_failed.append("❌ Keypoint Analysis")
-    except Exception as e:
-        print(f"❌ Không thể import step 3: {e}")
-        steps_failed.append("❌ Keypoint Analysis")
-    
-    return steps_completed, steps_failed
+def create_analyzer(args):
+    """Khởi tạo ISASAnalyzer (import khi thật sự chạy)"""
+    if DATA_ANALYSIS_DIR not in sys.path:
+        sys.path.insert(0, DATA_ANALYSIS_DIR)
+    from isas_analysis_complete import ISASAnalyzer
+    
+    analyzer = ISASAnalyzer()
+    analyzer.chart_dpi = args.dpi
+    analyzer.incremental = not args.force
+    
+    if args.subjects:
+        available = analyzer.manifest.available_subjects
+        unknown = [subject_id for subject_id in args.subjects if subject_id not in available]
+        if unknown:
+            print(f"⚠️  Không tìm thấy subject: {', '.join(unknown)}")
+        analyzer.manifest.selected_subjects = args.subjects
+    
+    print(f"👥 Subjects: {', '.join(analyzer.manifest.subjects) or '(không có)'}")
+    return analyzer
 
-def run_comprehensive_analysis():
-    """Chạy phân tích tổng quan với biểu đồ"""
-    print("\n📊 CHẠY PHÂN TÍCH TỔNG QUAN VÀ TẠO BIỂU ĐỒ...")
+def run_phases(analyzer, phases, workers):
+    """Chạy các phase theo thứ tự, trả về {phase: (thành công, thời gian)}"""
+    print("\n📋 CHẠY CÁC BƯỚC PHÂN TÍCH...")
     print("=" * 60)
     
-    try:
-        from data_analysis import _5_comprehensive_analysis as comprehensive
-        _, success = run_step("Phân tích tổng quan + Visualization", comprehensive.main)
-        return success
-    except Exception as e:
-        print(f"❌ Không thể chạy comprehensive analysis: {e}")
-        return False
+    charts_dir = analyzer.ensure_output_dir()
+    phase_functions = {
+        'overview': analyzer.run_data_overview,
+        'activities': analyzer.analyze_activities,
+        'quality': analyzer.analyze_keypoint_quality,
+        'charts': lambda: analyzer.update_visualizations(charts_dir, workers),
+        'report': lambda: analyzer.update_report(charts_dir),
+    }
+    
+    phase_results = {}
+    
+    # Duyệt file của các user song song trước các phase cần thống kê
+    if (workers is None or workers > 1) and {'overview', 'quality'} & set(phases):
+        _, success, elapsed_time = run_step("Thống kê song song theo user", analyzer.prefetch_recording_stats, workers)
+        phase_results['prefetch'] = (success, elapsed_time)
+    
+    for phase in phases:
+        failed_dependencies = [dependency for dependency in PHASE_DEPENDENCIES[phase]
+                               if not phase_results.get(dependency, (False,))[0]]
+        if failed_dependencies:
+            print(f"\n⏭️ Bỏ qua {PHASE_TITLES[phase]}: phase phụ thuộc lỗi ({', '.join(failed_dependencies)})")
+            phase_results[phase] = (False, 0.0)
+            continue
+        
+        _, success, elapsed_time = run_step(PHASE_TITLES[phase], phase_functions[phase])
+        phase_results[phase] = (success, elapsed_time)
+    
+    return phase_results
 
-def print_final_summary(steps_completed, steps_failed, comprehensive_success):
+def print_final_summary(phase_results, phases, total_time):
     """In tóm tắt cuối cùng"""
-    print("\n🎉 TÓM TẮT KẾT QUỢ PHÂN TÍCH")
+    print("\n🎉 TÓM TẮT KẾT QUẢ PHÂN TÍCH")
     print("=" * 70)
     
-    print("\n📋 CÁC BƯỚC ĐÃ HOÀN THÀNH:")
-    for step in steps_completed:
-        print(f"   {step}")
+    print("\n⏱️  THỜI GIAN TỪNG BƯỚC:")
+    for phase, (success, elapsed_time) in phase_results.items():
+        status = "✅" if success else "❌"
+        title = PHASE_TITLES.get(phase, "Thống kê song song theo user")
+        share = elapsed_time / total_time * 100 if total_time > 0 else 0
+        print(f"   {status} {phase:<10} {elapsed_time:8.2f}s ({share:5.1f}%)  {title}")
+    print(f"   {'TỔNG':<13} {total_time:8.2f}s")
     
-    if comprehensive_success:
-        print("   ✅ Comprehensive Analysis + Visualization")
+    steps_completed = [phase for phase, (success, _) in phase_results.items() if success]
+    steps_failed = [phase for phase, (success, _) in phase_results.items() if not success]
     
     if steps_failed:
         print("\n❌ CÁC BƯỚC THẤT BẠI:")
-        for step in steps_failed:
-            print(f"   {step}")
-    
-    if not comprehensive_success:
-        print("   ❌ Comprehensive Analysis + Visualization")
-    
-    # Kiểm tra files output
-    print("\n📁 FILES ĐÃ TẠO:")
+        for phase in steps_failed:
+            print(f"   ❌ {PHASE_TITLES.get(phase, phase)}")
     
-    output_files = [
-        ("output/comprehensive_analysis_report.md", "📄 Báo cáo chi tiết"),
-        ("output/charts/activity_distribution_analysis.png", "📊 Biểu đồ phân phối hoạt động"),
-        ("output/charts/keypoint_quality_analysis.png", "🎯 Biểu đồ chất lượng keypoints"),
-        ("output/charts/comprehensive_summary.png", "📈 Biểu đồ tổng kết")
-    ]
-    
-    files_created = []
-    files_missing = []
+    # Kiểm tra files output của các phase đã chạy
+    output_files = [(file_path, description) for file_path, description, phase in OUTPUT_FILES if phase in phases]
+    if output_files:
+        print("\n📁 FILES ĐÃ TẠO:")
     
+    files_created = 0
     for file_path, description in output_files:
         if os.path.exists(file_path):
             file_size = os.path.getsize(file_path)
-            files_created.append(f"   ✅ {description}: {file_path} ({file_size/1024:.1f}KB)")
+            files_created += 1
+            print(f"   ✅ {description}: {file_path} ({file_size/1024:.1f}KB)")
         else:
-            files_missing.append(f"   ❌ {description}: {file_path}")
-    
-    for file_info in files_created:
-        print(file_info)
-    
-    for file_info in files_missing:
-        print(file_info)
+            print(f"   ❌ {description}: {file_path}")
     
     # Đánh giá tổng thể
-    total_steps = len(steps_completed) + len(steps_failed)
+    total_steps = len(phase_results)
     success_rate = len(steps_completed) / total_steps * 100 if total_steps > 0 else 0
     
     print(f"\n🏆 ĐÁNH GIÁ TỔNG THỂ:")
     print(f"   📊 Tỷ lệ thành công: {success_rate:.1f}% ({len(steps_completed)}/{total_steps} bước)")
-    print(f"   📁 Files tạo được: {len(files_created)}/{len(output_files)}")
+    if output_files:
+        print(f"   📁 Files tạo được: {files_created}/{len(output_files)}")
     
-    if success_rate >= 75 and len(files_created) >= 3:
+    if success_rate == 100:
         print("   🎉 KẾT QUẢ: XUẤT SẮC! Phân tích hoàn thành tốt.")
     elif success_rate >= 50:
         print("   👍 KẾT QUẢ: TỐT! Hầu hết phân tích đã hoàn thành.")
@@ -215,29 +268,58 @@ def print_final_summary(steps_completed, steps_failed, comprehensive_success):
     print(f"\n⏰ Thời gian hoàn thành: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("🚀" + "=" * 70 + "🚀")
 
-def main():
+def parse_list(value):
+    """'a,b, c' -> ['a', 'b', 'c']"""
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Chạy phân tích dữ liệu ISAS Challenge 2025")
+    parser.add_argument('--phases', type=parse_list, default=list(PHASES),
+                        help=f"Các phase cần chạy, cách nhau bởi dấu phẩy ({', '.join(PHASES)}; mặc định: tất cả)")
+    parser.add_argument('--subjects', type=parse_list, default=None,
+                        help="Chỉ phân tích các subject này, vd: 1,2,5 (mặc định: tất cả trong Train_Data)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Số process phân tích song song theo user (0 = số CPU, 1 = tuần tự)")
+    parser.add_argument('--no-charts', action='store_true',
+                        help="Không vẽ biểu đồ (không cần matplotlib/seaborn)")
+    parser.add_argument('--dpi', type=int, default=300,
+                        help="Độ phân giải biểu đồ PNG (mặc định: 300)")
+    parser.add_argument('--force', action='store_true',
+                        help="Bỏ qua cache, tính lại thống kê và tạo lại biểu đồ/báo cáo")
+    args = parser.parse_args(argv)
+    
+    unknown_phases = [phase for phase in args.phases if phase not in PHASES]
+    if unknown_phases:
+        parser.error(f"phase không hợp lệ: {', '.join(unknown_phases)} (chọn từ: {', '.join(PHASES)})")
+    if args.no_charts:
+        args.phases = [phase for phase in args.phases if phase != 'charts']
+    return args
+
+def main(argv=None):
     """Hàm chính"""
+    args = parse_args(argv)
     start_time = time.time()
     
     # 1. In header
     print_header()
+    phases = resolve_phases(args.phases)
+    print(f"🧩 Phases: {', '.join(phases)}")
     
-    # 2. Kiểm tra yêu cầu
-    if not check_requirements():
+    # 2. Kiểm tra yêu cầu (chỉ các package của phase được chọn)
+    if not check_requirements(phases):
         print("\n❌ Không đủ yêu cầu để chạy phân tích!")
-        return
-    
-    # 3. Chạy các kiểm tra riêng lẻ
-    steps_completed, steps_failed = run_individual_checks()
+        return 1
     
-    # 4. Chạy phân tích tổng quan
-    comprehensive_success = run_comprehensive_analysis()
+    # 3. Chạy các phase
+    analyzer = create_analyzer(args)
+    phase_results = run_phases(analyzer, phases, args.workers or None)
     
-    # 5. Tóm tắt kết quả
+    # 4. Tóm tắt kết quả
     total_time = time.time() - start_time
     print(f"\n⏱️  Tổng thời gian thực hiện: {total_time:.1f} giây ({total_time/60:.1f} phút)")
     
-    print_final_summary(steps_completed, steps_failed, comprehensive_success)
+    print_final_summary(phase_results, phases, total_time)
+    return 0 if all(success for success, _ in phase_results.values()) else 1
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main())